@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+AIMD (additive increase, multiplicative decrease) send controller.
+
+A fixed delay or worker count is wrong for most relays: too aggressive and we
+get 421 "slow down" replies, too gentle and throughput is left unused. The
+controller watches per-message send latency and the rate of transient
+failures (4xx replies other than the per-mailbox 450/452, dropped
+connections) over a sliding window of sends:
+
+    - healthy window  -> one more active connection and +rate_step msg/s
+    - congested window (transient error rate above threshold, p90 latency
+      above target, or an explicit 421/451) -> halve connections and rate
+
+Every decision is counted and exposed through metrics(); the history keeps
+the most recent MAX_HISTORY changes (repeated "hold" decisions are only
+counted), so memory use stays flat on million-recipient runs.
+
+Settings come from the environment:
+    SEND_MAX_CONNECTIONS   upper bound on parallel connections (default 3)
+    SEND_MAX_RATE          upper bound in messages/sec (default 2)
+    SEND_START_RATE        initial messages/sec (default 0.5, the old 2s delay)
+    SEND_TARGET_LATENCY    p90 send latency in seconds before backing off (default 8)
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+from smtp_pool import RateLimiter
+
+# Replies about the relay itself ("service not available", "local error,
+# try later") mean slow down. 450/452 are about one mailbox (unavailable,
+# over quota): the send is still retried, but it says nothing about the rate.
+SLOW_DOWN_CODES = (421, 451)
+MAILBOX_CODES = (450, 452)
+MAX_HISTORY = 1000
+
+
+class AIMDController:
+    """Adapts concurrency and send rate from live latency and error feedback."""
+
+    def __init__(self, max_concurrency=3, max_rate=2.0, start_rate=0.5, min_rate=0.1,
+                 target_latency=8.0, error_threshold=0.05, window=10, rate_step=0.25,
+                 decrease_factor=0.5):
+        self.max_concurrency = max_concurrency
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.target_latency = target_latency
+        self.error_threshold = error_threshold
+        self.window = window
+        self.rate_step = rate_step
+        self.decrease_factor = decrease_factor
+
+        self.concurrency = 1
+        self.limiter = RateLimiter(min(start_rate, max_rate))
+        self._samples = deque(maxlen=window)
+        self._since_decision = 0
+        self._lock = threading.Lock()
+        self.decisions = deque(maxlen=MAX_HISTORY)
+        self.counts = {'increase': 0, 'decrease': 0, 'hold': 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(max_concurrency=int(os.getenv('SEND_MAX_CONNECTIONS', '3')),
+                   max_rate=float(os.getenv('SEND_MAX_RATE', '2')),
+                   start_rate=float(os.getenv('SEND_START_RATE', '0.5')),
+                   target_latency=float(os.getenv('SEND_TARGET_LATENCY', '8')))
+
+    @property
+    def rate(self):
+        return self.limiter.rate
+
+    def record(self, latency, transient=False, smtp_code=None):
+        """Feed one send outcome; may trigger an increase or decrease."""
+        # One unavailable mailbox must not slow the run down for everyone
+        congestion = transient and smtp_code not in MAILBOX_CODES
+        with self._lock:
+            self._samples.append((latency, congestion))
+            self._since_decision += 1
+            if smtp_code in SLOW_DOWN_CODES and self._since_decision >= max(1, self.window // 2):
+                self._decide('decrease', f"relay replied {smtp_code}")
+            elif self._since_decision >= self.window:
+                self._evaluate()
+
+    def _window_stats(self):
+        latencies = sorted(latency for latency, _ in self._samples if latency is not None)
+        p90 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.9))] if latencies else 0.0
+        errors = sum(1 for _, transient in self._samples if transient)
+        return p90, errors / len(self._samples) if self._samples else 0.0
+
+    def _evaluate(self):
+        p90, error_rate = self._window_stats()
+        if error_rate > self.error_threshold:
+            self._decide('decrease', f"transient errors {error_rate:.0%}")
+        elif p90 > self.target_latency:
+            self._decide('decrease', f"p90 latency {p90:.1f}s")
+        elif self.concurrency < self.max_concurrency or self.rate < self.max_rate:
+            self._decide('increase', f"p90 {p90:.1f}s, errors {error_rate:.0%}")
+        else:
+            self._decide('hold', "at configured maximum")
+
+    def _decide(self, action, reason):
+        if action == 'increase':
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self.limiter.set_rate(min(self.max_rate, self.rate + self.rate_step))
+        elif action == 'decrease':
+            self.concurrency = max(1, int(self.concurrency * self.decrease_factor))
+            self.limiter.set_rate(max(self.min_rate, self.rate * self.decrease_factor))
+        self._since_decision = 0
+        self.counts[action] += 1
+        if action == 'hold' and self.decisions and self.decisions[-1]['action'] == 'hold':
+            return
+        p90, error_rate = self._window_stats()
+        self.decisions.append({'time': time.time(), 'action': action, 'reason': reason,
+                               'concurrency': self.concurrency, 'rate': round(self.rate, 3),
+                               'p90_latency': round(p90, 3), 'transient_error_rate': round(error_rate, 3)})
+
+    def state(self):
+        """Short description for the progress line."""
+        last = self.decisions[-1]['action'] if self.decisions else 'start'
+        return f"{self.concurrency} conn, {self.rate:.2f} msg/s ({last})"
+
+    def metrics(self):
+        """Current settings, window statistics and the full decision history."""
+        with self._lock:
+            p90, error_rate = self._window_stats()
+            return {
+                'concurrency': self.concurrency,
+                'rate': self.rate,
+                'p90_latency': p90,
+                'transient_error_rate': error_rate,
+                'decision_counts': dict(self.counts),
+                'decisions': list(self.decisions),
+            }
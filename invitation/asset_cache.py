@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for generated email assets.
+
+Each asset is stored under the SHA-256 of everything that determines its
+content (template, font, size, name, ...), together with a pre-encoded base64
+MIME payload. Repeated campaigns and retries hit the cache and skip both PIL
+rendering and base64 encoding. The cache is bounded by total bytes and evicts
+least recently used entries first.
+
+Usage:
+    python asset_cache.py stats
+    python asset_cache.py clear
+"""
+
+import base64
+import hashlib
+import os
+import sys
+import threading
+import time
+
+DEFAULT_CACHE_DIR = "generated_invites"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+STALE_TMP_SECONDS = 3600  # put() renames its temp files within milliseconds
+
+_digest_memo = {}
+
+
+def cache_key(*parts):
+    """Hash an ordered sequence of str/bytes/int parts into a hex key."""
+    h = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = str(part).encode('utf-8')
+        h.update(len(part).to_bytes(8, 'big'))
+        h.update(part)
+    return h.hexdigest()
+
+
+def file_digest(path):
+    """SHA-256 of a file's content, memoized on (path, size, mtime)."""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _digest_memo.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        digest = _digest_memo[memo_key] = h.hexdigest()
+    return digest
+
+
+def encode_mime_base64(data):
+    """Base64-encode bytes the way email.encoders does (76-char lines)."""
+    return base64.encodebytes(data).decode('ascii')
+
+
+class AssetCache:
+    """
+    On-disk LRU cache of `<key>.<ext>` files plus `<key>.b64` MIME payloads.
+    Safe to share between threads of one process.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> [ext, bytes_on_disk, last_used]
+        self._total = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        self._sweep_tmp()
+        for entry in os.scandir(self.cache_dir):
+            key, _, ext = entry.name.partition('.')
+            if not ext or ext.endswith('.tmp') or not entry.is_file():
+                continue
+            stat = entry.stat()
+            record = self._entries.setdefault(key, [None, 0, 0])
+            if ext != 'b64':
+                record[0] = ext
+            record[1] += stat.st_size
+            record[2] = max(record[2], stat.st_mtime)
+            self._total += stat.st_size
+        # Drop half-written entries (missing either file)
+        for key in [k for k, r in self._entries.items() if r[0] is None]:
+            self._remove(key)
+
+    def _sweep_tmp(self, max_age=STALE_TMP_SECONDS):
+        """
+        Remove temp files left by a put() that crashed before its rename.
+        Recent ones may belong to a put() still running in another process
+        and are kept. Returns (count, bytes) of the temp files left.
+        """
+        count = size = 0
+        cutoff = time.time() - max_age
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith('.tmp') or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+                if stat.st_mtime < cutoff:
+                    os.remove(entry.path)
+                    continue
+            except FileNotFoundError:
+                continue
+            count += 1
+            size += stat.st_size
+        return count, size
+
+    def path_for(self, key, ext):
+        return os.path.join(self.cache_dir, f"{key}.{ext}")
+
+    def get(self, key):
+        """Return (file_path, base64_payload) or None, marking the entry as used."""
+        with self._lock:
+            record = self._entries.get(key)
+            if record is None:
+                return None
+            path = self.path_for(key, record[0])
+            try:
+                with open(self.path_for(key, 'b64'), 'r', encoding='ascii') as f:
+                    encoded = f.read()
+                os.utime(path)
+            except FileNotFoundError:
+                self._remove(key)
+                return None
+            record[2] = os.path.getmtime(path)
+            return path, encoded
+
+    def put(self, key, ext, data):
+        """Store raw bytes and their base64 payload. Returns (file_path, base64_payload)."""
+        encoded = encode_mime_base64(data)
+        path = self.path_for(key, ext)
+        # Write to temp names and rename so readers never see partial files
+        for target, content, mode in ((self.path_for(key, 'b64'), encoded.encode('ascii'), 'wb'),
+                                      (path, data, 'wb')):
+            tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, mode) as f:
+                f.write(content)
+            os.replace(tmp, target)
+
+        with self._lock:
+            if key in self._entries:
+                self._total -= self._entries[key][1]
+            size = len(data) + len(encoded)
+            self._entries[key] = [ext, size, os.path.getmtime(path)]
+            self._total += size
+            self._evict(keep=key)
+        return path, encoded
+
+    def _remove(self, key):
+        record = self._entries.pop(key, None)
+        if record is None:
+            return
+        self._total -= record[1]
+        for ext in (record[0], 'b64'):
+            if ext:
+                try:
+                    os.remove(self.path_for(key, ext))
+                except FileNotFoundError:
+                    pass
+
+    def _evict(self, keep=None):
+        """
+        Drop least recently used entries until under max_bytes. `keep` (the
+        entry just written) is never dropped, even if it alone is over the
+        limit, since its path is handed back to the caller.
+        """
+        if self._total <= self.max_bytes:
+            return
+        for key, _ in sorted(self._entries.items(), key=lambda item: item[1][2]):
+            if self._total <= self.max_bytes:
+                break
+            if key != keep:
+                self._remove(key)
+
+    def stats(self):
+        """Entry count and size; `bytes` includes temp files not yet swept."""
+        tmp_files, tmp_bytes = self._sweep_tmp()
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._total + tmp_bytes,
+                    'tmp_files': tmp_files, 'max_bytes': self.max_bytes}
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+        self._sweep_tmp()
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache(cache_dir=DEFAULT_CACHE_DIR):
+    """Process-wide cache instance for `cache_dir`."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None or _default_cache.cache_dir != cache_dir:
+            max_bytes = int(os.getenv('ASSET_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+            _default_cache = AssetCache(cache_dir, max_bytes)
+        return _default_cache
+
+
+if __name__ == "__main__":
+    cache = get_default_cache()
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        cache.clear()
+        print(f"🧹 Cleared {cache.cache_dir}")
+    else:
+        stats = cache.stats()
+        print(f"📦 {cache.cache_dir}: {stats['entries']} assets, "
+              f"{stats['bytes'] / 1024 / 1024:.1f} MB of {stats['max_bytes'] / 1024 / 1024:.0f} MB"
+              + (f" ({stats['tmp_files']} temp files being written)" if stats['tmp_files'] else ""))
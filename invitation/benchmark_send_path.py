@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Regression benchmarks for every stage of the send path.
+
+Synthetic recipient workbooks (1k / 100k / 1M rows) are generated once into
+bench_data/ and reused. Each run times:
+
+    excel_read   read_recipients_from_excel over the whole workbook
+    render       variant pick + subject/text/HTML rendering for every row
+    image        generate_invitation_image with a cold cache
+    mime         build_invitation_message + serialisation (cached invitation)
+    delivery     send_single_email through an SMTP pool to a local sink
+
+and reports the best per-item time of --repeat runs. mime and delivery
+write to disk and sockets and vary far more from run to run, so they report
+the median of at least IO_REPEAT runs instead and are checked against the
+wider --io-threshold. Results are compared with the stored baseline
+(benchmark_baseline.json); any stage slower than the baseline by more than
+its threshold, or a missing baseline file, makes the script exit with
+status 1, so it can gate CI or a pre-release check. The committed baseline
+was recorded on a development machine; re-save it on the machine that runs
+the check (both environments are printed when they differ).
+
+--memory instead sends whole workbooks to the sink in child processes, in
+the standard and the --low-memory mode, and compares peak RSS across sizes.
+Each size is measured with inline strings and with a shared strings table
+(the layout Excel saves), since the two are read differently:
+the low-memory mode fails the check if its peak grows by more than
+--memory-tolerance MB from the smallest to the largest list (Linux/macOS).
+
+Usage:
+    python benchmark_send_path.py                         # 1k and 100k rows
+    python benchmark_send_path.py --sizes 1k,100k,1m
+    python benchmark_send_path.py --save-baseline         # accept current numbers
+    python benchmark_send_path.py --memory --sizes 1k,20k
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from email import policy
+
+from PIL import Image, ImageDraw
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(SCRIPT_DIR, "bench_data")
+DEFAULT_BASELINE = os.path.join(SCRIPT_DIR, "benchmark_baseline.json")
+
+# Per-message stages don't depend on list size; time a fixed sample instead
+IMAGE_SAMPLE = 20
+MIME_SAMPLE = 500
+DELIVERY_SAMPLE = 1000
+MIN_STAGE_SECONDS = 1.0
+IO_STAGES = ('mime', 'delivery')
+IO_REPEAT = 5
+
+FIRST_NAMES = ["Aarav", "Priya", "Rajesh", "Sneha", "Vikram", "Divya", "Karthik", "Meena", "Arjun", "Lakshmi"]
+LAST_NAMES = ["Kumar", "Sharma", "Patel", "Reddy", "Singh", "Iyer", "Nair", "Rao", "Das", "Menon"]
+
+
+def parse_size(text):
+    """'1k' -> 1000, '1m' -> 1000000"""
+    text = text.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * multiplier)
+
+
+def synthetic_workbook(rows):
+    """Path to a workbook with `rows` generated recipients, created on first use."""
+    from openpyxl import Workbook
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"recipients_{rows}.xlsx")
+    if os.path.exists(path):
+        return path
+
+    print(f"📝 Generating {rows:,} synthetic recipients -> {path}")
+    rng = random.Random(rows)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Recipients")
+    ws.append(["Name", "Email"])
+    for i in range(rows):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        ws.append([f"{first} {last}", f"{first}.{last}.{i}@example.com".lower()])
+    tmp_path = path + ".tmp"
+    wb.save(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/sharedStrings.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<bookViews><workbookView activeTab="0"/></bookViews>'
+        '<sheets><sheet name="Recipients" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="sharedStrings.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings"/>'
+        '</Relationships>'),
+}
+
+
+def synthetic_shared_workbook(rows):
+    """
+    Like synthetic_workbook(), but laid out the way Excel saves files: every
+    cell refers to the shared strings table. openpyxl's write-only mode
+    writes inline strings instead, so this one is written as raw XML.
+    """
+    import zipfile
+    from xml.sax.saxutils import escape
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"recipients_{rows}_shared.xlsx")
+    if os.path.exists(path):
+        return path
+
+    print(f"📝 Generating {rows:,} synthetic recipients (shared strings) -> {path}")
+    rng = random.Random(rows)
+    tmp_path = path + ".tmp"
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, xml in _XLSX_PARTS.items():
+            archive.writestr(name, xml)
+        # Cell i of the sheet refers to shared string i (header row included)
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                        + f'<dimension ref="A1:B{rows + 1}"/><sheetData>'.encode())
+            for number in range(1, rows + 2):
+                index = (number - 1) * 2
+                sheet.write(f'<row r="{number}"><c r="A{number}" t="s"><v>{index}</v></c>'
+                            f'<c r="B{number}" t="s"><v>{index + 1}</v></c></row>'.encode())
+            sheet.write(b'</sheetData></worksheet>')
+        with archive.open('xl/sharedStrings.xml', 'w') as strings:
+            strings.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                          b'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                          b'<si><t>Name</t></si><si><t>Email</t></si>')
+            for i in range(rows):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                values = (f"{first} {last}", f"{first}.{last}.{i}@example.com".lower())
+                strings.write(''.join(f'<si><t>{escape(v)}</t></si>' for v in values).encode('utf-8'))
+            strings.write(b'</sst>')
+    os.replace(tmp_path, path)
+    return path
+
+
+def synthetic_template():
+    """A plain invitation template image with a ribbon band where the name goes."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, "template.png")
+    if not os.path.exists(path):
+        img = Image.new("RGB", (2000, 1414), (250, 246, 235))
+        draw = ImageDraw.Draw(img)
+        draw.rectangle((0, int(1414 * 0.69), 2000, int(1414 * 0.77)), fill=(180, 30, 40))
+        img.save(path)
+    return path
+
+
+def time_stage(repeat, fn, summary=min, min_time=MIN_STAGE_SECONDS):
+    """
+    Run fn() at least `repeat` times, and until `min_time` seconds have been
+    spent, so millisecond stages (1k rows) aren't judged on a few noisy runs.
+    Returns (summary of the run times, item count): the best run for CPU-bound
+    stages, the median for I/O-bound ones, where the best run is luck.
+    """
+    times, items = [], 0
+    while len(times) < repeat or sum(times) < min_time:
+        started = time.perf_counter()
+        items = fn()
+        times.append(time.perf_counter() - started)
+    return summary(times), items
+
+
+def bench_excel_read(path):
+    from send_invitations import read_recipients_from_excel
+    return lambda: len(read_recipients_from_excel(path, suppressed=frozenset()))
+
+
+def bench_render(recipients, campaign):
+    from campaign import pick_variant, render_variant
+
+    def run():
+        for recipient in recipients:
+            render_variant(pick_variant(campaign, recipient['email']), recipient)
+        return len(recipients)
+    return run
+
+
+def bench_image(recipients, template):
+    from send_invitations import generate_invitation_image
+
+    def run():
+        output_dir = tempfile.mkdtemp(prefix="bench_invites_", dir=DATA_DIR)
+        try:
+            for recipient in recipients:
+                if not generate_invitation_image(recipient['name'], template, output_dir):
+                    raise RuntimeError("image generation failed")
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+        return len(recipients)
+    return run
+
+
+def bench_mime(recipients, smtp_config, logos, template, campaign):
+    from campaign import pick_variant
+    from send_invitations import build_invitation_message
+
+    def run():
+        for recipient in recipients:
+            msg, _ = build_invitation_message(recipient, smtp_config, logos, template,
+                                              pick_variant(campaign, recipient['email']))
+            msg.as_bytes(policy=policy.SMTP)
+        return len(recipients)
+    return run
+
+
+def bench_delivery(recipients, smtp_config, logos, template, campaign, connections):
+    from progress import ProgressView
+    from send_invitations import send_single_email
+    from smtp_pool import SMTPPool
+    from concurrent.futures import ThreadPoolExecutor
+
+    def run():
+        pool = SMTPPool(smtp_config, size=connections)
+        with ProgressView(len(recipients), stream=io.StringIO()) as progress, \
+                ThreadPoolExecutor(max_workers=connections) as executor:
+            results = list(executor.map(
+                lambda item: send_single_email(item[1], smtp_config, logos, item[0], len(recipients),
+                                               template, progress, pool, campaign),
+                enumerate(recipients, 1)))
+        pool.close()
+        failed = [r for r in results if r['status'] != 'success']
+        if failed:
+            raise RuntimeError(f"{len(failed)} deliveries failed, e.g. {failed[0]['error']}")
+        return len(recipients)
+    return run
+
+
+def run_benchmarks(sizes, repeat, campaign_file=None, connections=4):
+    """Time every stage; returns {stage_key: {'items', 'seconds', 'per_item'}}."""
+    from campaign import load_campaign
+    from send_invitations import load_logos_for_email, read_recipients_from_excel
+    from smtp_sink import SMTPSink
+
+    campaign = load_campaign(campaign_file)
+    results = {}
+
+    def record(key, seconds, items):
+        results[key] = {'items': items, 'seconds': round(seconds, 6), 'per_item': seconds / items}
+        print(f"   {key:<22} {items:>9,} items  {seconds:9.3f}s  {seconds / items * 1e6:11.1f} µs/item")
+
+    print(f"\n⏱️  Timing send path stages (best of {repeat}+ runs, at least {MIN_STAGE_SECONDS:g}s each; "
+          f"median of {max(repeat, IO_REPEAT)}+ for {' and '.join(IO_STAGES)})")
+    recipients = []
+    for rows in sizes:
+        path = synthetic_workbook(rows)
+        record(f"excel_read:{rows}", *time_stage(repeat, bench_excel_read(path)))
+        recipients = read_recipients_from_excel(path, suppressed=frozenset())
+        record(f"render:{rows}", *time_stage(repeat, bench_render(recipients, campaign)))
+
+    template = synthetic_template()
+    logos = load_logos_for_email()
+    cwd = os.getcwd()
+    os.chdir(DATA_DIR)  # keep the invitation cache used by MIME assembly out of the project
+    try:
+        record("image", *time_stage(repeat, bench_image(recipients[:IMAGE_SAMPLE], template)))
+
+        with SMTPSink() as sink:
+            smtp_config = sink.smtp_config()
+            sample = recipients[:max(MIME_SAMPLE, DELIVERY_SAMPLE)]
+            # Warm the invitation cache: steady-state sends reuse rendered images
+            bench_mime(sample, smtp_config, logos, template, campaign)()
+            io_repeat = max(repeat, IO_REPEAT)
+            record("mime", *time_stage(io_repeat, bench_mime(sample[:MIME_SAMPLE], smtp_config, logos,
+                                                              template, campaign), statistics.median))
+            record("delivery", *time_stage(io_repeat, bench_delivery(sample[:DELIVERY_SAMPLE], smtp_config,
+                                                                      logos, template, campaign, connections),
+                                           statistics.median))
+    finally:
+        os.chdir(cwd)
+    return results
+
+
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, KB on Linux
+
+
+def memory_child(path, low_memory):
+    """Send a whole workbook to an in-process sink; prints peak RSS as JSON."""
+    from send_invitations import (count_recipients_in_excel, iter_recipients_from_excel,
+                                  read_recipients_from_excel, send_invitation_emails)
+    from smtp_sink import SMTPSink
+
+    path = os.path.abspath(path)
+    # Let the controller go as fast as the sink allows; no invitation images
+    os.environ.update(SEND_START_RATE='100000', SEND_MAX_RATE='100000', SEND_MAX_CONNECTIONS='4',
+                      INVITE_TEMPLATE='')
+    work_dir = tempfile.mkdtemp(prefix="bench_memory_", dir=DATA_DIR)
+    os.chdir(work_dir)
+    try:
+        with SMTPSink() as sink, contextlib.redirect_stdout(io.StringIO()):
+            before = peak_rss_mb()
+            if low_memory:
+                recipients = iter_recipients_from_excel(path, frozenset(), low_memory=True)
+                total = count_recipients_in_excel(path, frozenset())
+            else:
+                recipients = read_recipients_from_excel(path, frozenset())
+                total = len(recipients)
+            send_invitation_emails(recipients, sink.smtp_config(), path, low_memory=low_memory, total=total)
+            delivered = sink.messages
+    finally:
+        os.chdir(SCRIPT_DIR)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(json.dumps({'rows': total, 'delivered': delivered, 'startup_mb': before, 'peak_mb': peak_rss_mb()}))
+
+
+def run_memory_benchmark(sizes, tolerance):
+    """
+    Peak RSS per list size in both modes, for workbooks with inline strings
+    and with a shared strings table; returns False if low-memory mode grew.
+    """
+    print("\n🧠 Peak RSS while sending whole workbooks to a local sink")
+    layouts = {'inline': synthetic_workbook, 'shared': synthetic_shared_workbook}
+    peaks = {}
+    for rows in sizes:
+        for layout, make_workbook in layouts.items():
+            path = make_workbook(rows)
+            for low_memory in (False, True):
+                command = [sys.executable, os.path.abspath(__file__), "--memory-child", path]
+                if low_memory:
+                    command.append("--low-memory")
+                output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                if result['delivered'] != result['rows']:
+                    raise RuntimeError(f"only {result['delivered']} of {result['rows']} messages delivered")
+                mode = "low-memory" if low_memory else "standard"
+                peaks[(mode, layout, rows)] = result['peak_mb']
+                print(f"   {mode:<11} {layout:<7} {rows:>9,} rows  peak {result['peak_mb']:8.1f} MB "
+                      f"(after imports {result['startup_mb']:.1f} MB)")
+
+    smallest, largest = min(sizes), max(sizes)
+    ok = True
+    for mode in ("standard", "low-memory"):
+        for layout in layouts:
+            growth = peaks[(mode, layout, largest)] - peaks[(mode, layout, smallest)]
+            print(f"   {mode} ({layout} strings): {growth:+.1f} MB from {smallest:,} to {largest:,} rows")
+            if mode == "low-memory" and growth > tolerance:
+                ok = False
+    return ok
+
+
+def environment():
+    return {'python': platform.python_version(), 'machine': platform.machine(),
+            'node': platform.node(), 'processor': platform.processor()}
+
+
+def describe_environment(env):
+    return ", ".join(f"{key}={env.get(key) or '?'}" for key in ('node', 'python', 'machine', 'processor'))
+
+
+def compare(results, baseline, threshold, io_threshold):
+    """Print a comparison table; returns the list of regressed stage keys."""
+    regressions = []
+    print(f"\n📊 Compared with baseline ({baseline.get('created', 'unknown date')}, threshold +{threshold:.0%}, "
+          f"+{io_threshold:.0%} for {' and '.join(IO_STAGES)}):")
+    current_env, baseline_env = environment(), baseline.get('environment') or {}
+    if baseline_env != current_env:
+        # Say so up front: a slower machine otherwise shows up as regressions
+        print(f"   ⚠️  Baseline was recorded elsewhere; compare with care or re-save it here\n"
+              f"      baseline:     {describe_environment(baseline_env)}\n"
+              f"      this machine: {describe_environment(current_env)}")
+    for key, current in results.items():
+        reference = baseline['results'].get(key)
+        if not reference:
+            print(f"   ⚠️  {key:<20} not in the baseline, not checked (re-save the baseline for these sizes)")
+            continue
+        limit = io_threshold if key.split(':')[0] in IO_STAGES else threshold
+        change = current['per_item'] / reference['per_item'] - 1
+        marker = "❌" if change > limit else "✅"
+        print(f"   {marker} {key:<20} {reference['per_item'] * 1e6:11.1f} -> "
+              f"{current['per_item'] * 1e6:11.1f} µs/item ({change:+.0%})")
+        if change > limit:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the send path and check for regressions")
+    parser.add_argument("--sizes", default="1k,100k", help="Workbook sizes, e.g. 1k,100k,1m")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help=f"Runs per stage (best is kept; median of at least {IO_REPEAT} for "
+                             f"{', '.join(IO_STAGES)})")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown per stage before failing (0.25 = 25%%)")
+    parser.add_argument("--io-threshold", type=float, default=0.5,
+                        help=f"Allowed slowdown for the I/O-bound stages ({', '.join(IO_STAGES)})")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--campaign", help="Campaign file to render (default: built-in card)")
+    parser.add_argument("--connections", type=int, default=4, help="SMTP connections for the delivery stage")
+    parser.add_argument("--output", help="Also write this run's results to a JSON file")
+    parser.add_argument("--memory", action="store_true", help="Compare peak RSS of standard and low-memory sends")
+    parser.add_argument("--memory-tolerance", type=float, default=10.0,
+                        help="Allowed low-memory peak RSS growth across sizes, in MB")
+    parser.add_argument("--memory-child", help=argparse.SUPPRESS)
+    parser.add_argument("--low-memory", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.memory_child:
+        memory_child(args.memory_child, args.low_memory)
+        return
+
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    if args.memory:
+        if not run_memory_benchmark(sizes, args.memory_tolerance):
+            print(f"\n❌ Low-memory mode grew by more than {args.memory_tolerance:g} MB")
+            sys.exit(1)
+        print("\n✅ Low-memory mode stays flat")
+        return
+    results = run_benchmarks(sizes, args.repeat, args.campaign, args.connections)
+    run = {'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'environment': environment(), 'results': results}
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(run, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(run, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        # Without a baseline nothing is checked; that must not pass a CI gate
+        print(f"\n❌ No baseline at {args.baseline}; run with --save-baseline to create one")
+        sys.exit(1)
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold, args.io_threshold)
+    if regressions:
+        print(f"\n❌ Regressed: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
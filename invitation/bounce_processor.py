@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Bounce (DSN) processing and the recipient suppression index.
+
+Bounces that arrive in the sender's mailbox after a campaign are read from a
+local mbox, a Maildir or an IMAP folder. Delivery status notifications
+(multipart/report; report-type=delivery-status) are parsed for each failed
+recipient's status code, and the results are kept in a persistent SQLite
+suppression index:
+
+    - hard bounces (5.x.x, Action: failed) are suppressed immediately
+    - soft bounces (4.x.x / Action: delayed) after SOFT_BOUNCE_LIMIT occurrences
+
+read_recipients_from_excel loads the suppressed addresses into a set once and
+skips them with an O(1) lookup per row, so dead addresses stop consuming quota.
+
+Usage:
+    python bounce_processor.py scan --mbox bounces.mbox
+    python bounce_processor.py scan --maildir ~/Maildir
+    python bounce_processor.py scan --imap imap.gmail.com --user smvolunteers@ksrct.ac.in
+    python bounce_processor.py list
+    python bounce_processor.py remove someone@example.com
+"""
+
+import argparse
+import email
+import getpass
+import hashlib
+import imaplib
+import mailbox
+import os
+import re
+import sqlite3
+import time
+from email import policy
+
+DEFAULT_SUPPRESSION_DB = "suppression.db"
+SOFT_BOUNCE_LIMIT = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS suppressions (
+    email TEXT PRIMARY KEY,
+    status TEXT,
+    action TEXT,
+    diagnostic TEXT,
+    bounces INTEGER NOT NULL DEFAULT 0,
+    suppressed INTEGER NOT NULL DEFAULT 0,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS processed_messages (
+    message_id TEXT PRIMARY KEY,
+    processed_at REAL NOT NULL
+);
+"""
+
+_STATUS = re.compile(r'\b([245]\.\d{1,3}\.\d{1,3})\b')
+
+
+def open_suppression_db(db_path=DEFAULT_SUPPRESSION_DB):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def load_suppression_set(db_path=DEFAULT_SUPPRESSION_DB):
+    """All suppressed addresses (lowercase) as a set; empty if there is no index yet."""
+    if not os.path.exists(db_path):
+        return frozenset()
+    conn = sqlite3.connect(db_path)
+    try:
+        return frozenset(row[0] for row in conn.execute("SELECT email FROM suppressions WHERE suppressed = 1"))
+    except sqlite3.OperationalError:
+        return frozenset()
+    finally:
+        conn.close()
+
+
+def _address(field):
+    """'rfc822; User@Example.com' -> 'user@example.com'"""
+    value = str(field or '').split(';', 1)[-1].strip().strip('<>')
+    return value.lower() or None
+
+
+def parse_dsn(msg):
+    """
+    Extract bounce records from a message: a list of dicts with email, action,
+    status and diagnostic. Non-bounce messages return an empty list.
+    """
+    records = []
+    for part in msg.walk():
+        if part.get_content_type() != 'message/delivery-status':
+            continue
+        # Per-message fields come first, then one block per recipient
+        blocks = part.get_payload()
+        if not isinstance(blocks, list):
+            blocks = [email.message_from_string(block, policy=policy.default)
+                      for block in re.split(r'\r?\n\r?\n', str(blocks)) if block.strip()]
+        for block in blocks:
+            recipient = _address(block.get('Final-Recipient') or block.get('Original-Recipient'))
+            if not recipient:
+                continue
+            status = str(block.get('Status') or '').strip()
+            diagnostic = str(block.get('Diagnostic-Code') or '').strip()
+            if not status:
+                match = _STATUS.search(diagnostic)
+                status = match.group(1) if match else ''
+            records.append({
+                'email': recipient,
+                'action': str(block.get('Action') or '').strip().lower(),
+                'status': status,
+                'diagnostic': diagnostic[:500],
+            })
+
+    # Non-standard bounces (e.g. exim) at least name the failed recipients
+    if not records and msg.get('X-Failed-Recipients'):
+        body = msg.get_body(preferencelist=('plain',)) if hasattr(msg, 'get_body') else None
+        text = body.get_content() if body is not None else ''
+        match = _STATUS.search(text)
+        for recipient in str(msg['X-Failed-Recipients']).split(','):
+            records.append({'email': recipient.strip().lower(), 'action': 'failed',
+                            'status': match.group(1) if match else '5.0.0', 'diagnostic': ''})
+    return records
+
+
+def is_hard_bounce(record):
+    return record['status'].startswith('5') or (record['action'] == 'failed' and not record['status'])
+
+
+def record_bounces(conn, records, now=None):
+    """Update the suppression index with parsed bounce records. Returns newly suppressed addresses."""
+    now = now or time.time()
+    newly_suppressed = []
+    for record in records:
+        if record['action'] in ('delivered', 'relayed', 'expanded'):
+            continue
+        hard = is_hard_bounce(record)
+        row = conn.execute("SELECT bounces, suppressed FROM suppressions WHERE email = ?",
+                           (record['email'],)).fetchone()
+        bounces = (row[0] if row else 0) + 1
+        suppressed = 1 if (row and row[1]) or hard or bounces >= SOFT_BOUNCE_LIMIT else 0
+        conn.execute(
+            "INSERT INTO suppressions (email, status, action, diagnostic, bounces, suppressed,"
+            " first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(email) DO UPDATE SET status = excluded.status, action = excluded.action,"
+            " diagnostic = excluded.diagnostic, bounces = excluded.bounces,"
+            " suppressed = excluded.suppressed, last_seen = excluded.last_seen",
+            (record['email'], record['status'], record['action'], record['diagnostic'],
+             bounces, suppressed, now, now),
+        )
+        if suppressed and not (row and row[1]):
+            newly_suppressed.append(record['email'])
+    return newly_suppressed
+
+
+def message_key(msg):
+    """
+    Dedupe key for a processed message: its Message-ID, or a hash of its
+    content for DSNs sent without one, so rescans never count a bounce twice.
+    """
+    message_id = str(msg.get('Message-ID') or '').strip()
+    if message_id:
+        return message_id
+    try:
+        data = msg.as_bytes()
+    except Exception:
+        data = str(msg).encode('utf-8', 'replace')
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+
+def process_messages(conn, messages):
+    """Parse an iterable of email.message objects. Returns (dsn_count, newly_suppressed)."""
+    dsn_count = 0
+    newly_suppressed = []
+    for msg in messages:
+        key = message_key(msg)
+        if conn.execute("SELECT 1 FROM processed_messages WHERE message_id = ?", (key,)).fetchone():
+            continue
+        records = parse_dsn(msg)
+        if records:
+            dsn_count += 1
+            newly_suppressed += record_bounces(conn, records)
+        conn.execute("INSERT OR IGNORE INTO processed_messages VALUES (?, ?)", (key, time.time()))
+    conn.commit()
+    return dsn_count, newly_suppressed
+
+
+def _parse_bytes(data):
+    return email.message_from_bytes(data, policy=policy.default)
+
+
+def iter_mbox(path):
+    for message in mailbox.mbox(path, factory=None, create=False):
+        yield _parse_bytes(message.as_bytes())
+
+
+def iter_maildir(path):
+    box = mailbox.Maildir(path, factory=None, create=False)
+    for key in box.iterkeys():
+        yield _parse_bytes(box.get_bytes(key))
+
+
+def iter_imap(host, user, password, folder="INBOX", port=993):
+    """Yield likely bounce messages from an IMAP folder (read-only)."""
+    conn = imaplib.IMAP4_SSL(host, port)
+    try:
+        conn.login(user, password)
+        conn.select(folder, readonly=True)
+        _, data = conn.search(None, '(OR OR FROM "mailer-daemon" FROM "postmaster" '
+                                    'HEADER Content-Type "report-type=delivery-status")')
+        for num in data[0].split():
+            _, fetched = conn.fetch(num, '(BODY.PEEK[])')
+            for item in fetched:
+                if isinstance(item, tuple):
+                    yield _parse_bytes(item[1])
+    finally:
+        try:
+            conn.logout()
+        except Exception:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process bounces into the suppression index")
+    parser.add_argument("--db", default=DEFAULT_SUPPRESSION_DB, help="Suppression index path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    scan = sub.add_parser("scan", help="Read bounces from a mailbox")
+    source = scan.add_mutually_exclusive_group(required=True)
+    source.add_argument("--mbox")
+    source.add_argument("--maildir")
+    source.add_argument("--imap", metavar="HOST")
+    scan.add_argument("--user", default=os.getenv('SMTP_EMAIL'))
+    scan.add_argument("--folder", default="INBOX")
+    scan.add_argument("--port", type=int, default=993)
+
+    sub.add_parser("list", help="List suppressed addresses")
+    remove = sub.add_parser("remove", help="Remove addresses from the index")
+    remove.add_argument("emails", nargs="+")
+    add = sub.add_parser("add", help="Suppress addresses manually")
+    add.add_argument("emails", nargs="+")
+    args = parser.parse_args()
+
+    conn = open_suppression_db(args.db)
+    if args.command == "scan":
+        if args.mbox:
+            messages = iter_mbox(args.mbox)
+        elif args.maildir:
+            messages = iter_maildir(args.maildir)
+        else:
+            password = os.getenv('IMAP_PASSWORD') or os.getenv('SMTP_PASSWORD') \
+                or getpass.getpass("IMAP password: ")
+            messages = iter_imap(args.imap, args.user, password, args.folder, args.port)
+        dsn_count, newly_suppressed = process_messages(conn, messages)
+        print(f"📥 Processed {dsn_count} bounce reports")
+        print(f"🚫 Newly suppressed: {len(newly_suppressed)}")
+        for address in newly_suppressed:
+            print(f"   - {address}")
+    elif args.command == "list":
+        rows = conn.execute("SELECT email, status, bounces, diagnostic FROM suppressions"
+                            " WHERE suppressed = 1 ORDER BY last_seen DESC").fetchall()
+        print(f"🚫 {len(rows)} suppressed addresses")
+        for address, status, bounces, diagnostic in rows:
+            print(f"   {address}  {status or '-'}  x{bounces}  {diagnostic[:60]}")
+    elif args.command == "remove":
+        for address in args.emails:
+            conn.execute("DELETE FROM suppressions WHERE email = ?", (address.lower(),))
+        conn.commit()
+        print(f"✅ Removed {len(args.emails)} address(es)")
+    else:
+        record_bounces(conn, [{'email': a.lower(), 'action': 'failed', 'status': '5.0.0',
+                               'diagnostic': 'manually suppressed'} for a in args.emails])
+        conn.commit()
+        print(f"✅ Suppressed {len(args.emails)} address(es)")
+
+
+if __name__ == "__main__":
+    main()
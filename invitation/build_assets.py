@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Build the logo assets used in emails.
+
+Every logo is cropped to its visible content, resized, optimized and
+base64-encoded once. The encoded payloads are concatenated into
+assets/logos.bin and described by assets/manifest.json
+(cid -> offset, length, mime type, hash), which the sender memory-maps at
+startup so no image work happens on the send path.
+
+Usage:
+    python build_assets.py
+"""
+
+import hashlib
+import io
+import json
+import mmap
+import os
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+ASSETS_DIR = SCRIPT_DIR / "assets"
+MANIFEST_PATH = ASSETS_DIR / "manifest.json"
+BLOB_PATH = ASSETS_DIR / "logos.bin"
+
+# cid: (source file, longest side in pixels)
+# Logos are displayed at up to 160px, so 2x covers high-DPI screens.
+LOGO_SOURCES = {
+    'sm_logo': ('sm_logo_small.png', 320),
+    'clg_logo': ('clglogo.png', 320),
+    'ksrct_logo': ('ksrct_logo_nobg.png', 320),
+    'event_logo': ('eventlogio_nobg.png', 320),
+}
+
+
+def process_logo(source_path, max_dim):
+    """Crop, resize and optimize a logo. Returns PNG bytes."""
+    from PIL import Image
+
+    img = Image.open(source_path)
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA')
+    # Crop away transparent (or black) borders, like crop_logo.py
+    bbox = img.getchannel('A').getbbox() if img.mode == 'RGBA' else img.getbbox()
+    if bbox:
+        img = img.crop(bbox)
+    if max(img.size) > max_dim:
+        img.thumbnail((max_dim, max_dim), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def build_assets():
+    """Process every logo in LOGO_SOURCES and write the blob and manifest."""
+    from asset_cache import encode_mime_base64
+
+    ASSETS_DIR.mkdir(exist_ok=True)
+    manifest = {'built_at': time.time(), 'assets': {}}
+    offset = 0
+    tmp_blob = BLOB_PATH.with_suffix('.tmp')
+
+    with open(tmp_blob, 'wb') as blob:
+        for cid, (filename, max_dim) in LOGO_SOURCES.items():
+            source = SCRIPT_DIR / filename
+            if not source.exists():
+                print(f"⚠️  {filename} not found, skipping {cid}")
+                continue
+            data = process_logo(source, max_dim)
+            encoded = encode_mime_base64(data).encode('ascii')
+            blob.write(encoded)
+            manifest['assets'][cid] = {
+                'source': filename,
+                'mime': 'image/png',
+                'offset': offset,
+                'length': len(encoded),
+                'bytes': len(data),
+                'sha256': hashlib.sha256(data).hexdigest(),
+            }
+            offset += len(encoded)
+            print(f"✅ {cid}: {filename} {source.stat().st_size / 1024:.0f} KB -> {len(data) / 1024:.0f} KB")
+
+    # Both files are swapped in whole; blob_bytes lets the loader spot a blob
+    # and manifest from different builds (e.g. a build interrupted between them)
+    manifest['blob_bytes'] = offset
+    tmp_manifest = MANIFEST_PATH.with_suffix('.tmp')
+    with open(tmp_manifest, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_blob, BLOB_PATH)
+    os.replace(tmp_manifest, MANIFEST_PATH)
+    print(f"📦 Wrote {MANIFEST_PATH.relative_to(SCRIPT_DIR)} ({len(manifest['assets'])} logos)")
+    return manifest
+
+
+def load_asset_manifest(cids=None):
+    """
+    Load pre-encoded logos from the manifest as {cid: (base64_payload, mime_subtype)}.
+    Returns None if the assets have not been built, are older than their
+    sources, lack one of `cids`, or are unreadable, so the caller can fall
+    back to loading the logo files directly.
+    """
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        assets = manifest['assets']
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError, TypeError):
+        print(f"⚠️  {MANIFEST_PATH.name} is unreadable; run build_assets.py")
+        return None
+
+    missing = [cid for cid in cids or () if cid not in assets]
+    if missing:
+        print(f"⚠️  {', '.join(missing)} not in built assets; run build_assets.py")
+        return None
+    entries = {cid: entry for cid, entry in assets.items() if cids is None or cid in cids}
+    for entry in entries.values():
+        source = SCRIPT_DIR / entry['source']
+        if source.exists() and source.stat().st_mtime > manifest['built_at']:
+            print(f"⚠️  {entry['source']} changed since assets were built; run build_assets.py")
+            return None
+
+    logos = {}
+    try:
+        with open(BLOB_PATH, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as blob:
+            if len(blob) != manifest.get('blob_bytes', len(blob)):
+                raise ValueError("blob does not match manifest")
+            for cid, entry in entries.items():
+                end = entry['offset'] + entry['length']
+                if end > len(blob):
+                    raise ValueError(f"{cid} lies past the end of the blob")
+                logos[cid] = (blob[entry['offset']:end].decode('ascii'), entry['mime'].split('/', 1)[1])
+    except (OSError, ValueError, KeyError) as e:
+        # Missing or empty logos.bin (mmap of an empty file raises ValueError)
+        print(f"⚠️  Built assets unusable ({e}); run build_assets.py")
+        return None
+    return logos
+
+
+if __name__ == "__main__":
+    build_assets()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Campaign definitions with A/B template variants.
+
+A campaign file names one or more variants, each with an HTML template, a
+subject line and a weight:
+
+    {
+      "name": "sm-welcome",
+      "variants": [
+        {"name": "card", "template": "builtin:card",
+         "subject": "Congratulations {{NAME}}! - SM Volunteers", "weight": 1},
+        {"name": "ribbon", "template": "email_template_v2.html",
+         "subject": "Welcome to the SM Volunteers Forum, {{NAME}}", "weight": 1}
+      ]
+    }
+
+Templates use {{NAME}}, {{NAME_UPPER}}, {{FIRST_NAME}} and {{EMAIL}}
+placeholders. "builtin:card" and "builtin:premium" refer to the templates in
+send_invitations.py. Each variant is compiled once into literal chunks and
+field names, so rendering a message is a single join with no parsing. A
+text/plain version of every template is derived from the HTML at compile time
+(placeholders survive the conversion), so per message both parts are filled
+from the same values without any HTML processing.
+Recipients are assigned to variants deterministically by hashing their email,
+so re-runs and retries always get the same variant.
+
+Check a campaign file and its split:
+    python campaign.py campaign.json recipients.xlsx
+"""
+
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+from collections import Counter
+from html.parser import HTMLParser
+
+PLACEHOLDER = re.compile(r'\{\{\s*([A-Z_]+)\s*\}\}')
+FIELDS = ('NAME', 'NAME_UPPER', 'FIRST_NAME', 'EMAIL')
+
+DEFAULT_CAMPAIGN = {
+    'name': 'default',
+    'variants': [
+        {'name': 'card', 'template': 'builtin:card',
+         'subject': "Congratulations {{NAME}}! - SM Volunteers", 'weight': 1},
+    ],
+}
+
+
+def compile_template(text):
+    """
+    Split template text into (literals, fields): literals[i] is followed by
+    fields[i], and literals has one more entry than fields.
+    """
+    pieces = PLACEHOLDER.split(text)
+    literals, fields = pieces[0::2], pieces[1::2]
+    unknown = set(fields) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown template placeholder(s): {', '.join(sorted(unknown))}")
+    return literals, fields
+
+
+def render(compiled, values):
+    """Fill a compiled template from a dict of field values."""
+    literals, fields = compiled
+    out = [literals[0]]
+    for field, literal in zip(fields, literals[1:]):
+        out.append(values[field])
+        out.append(literal)
+    return ''.join(out)
+
+
+def recipient_values(recipient):
+    """Placeholder values for one recipient."""
+    name = recipient['name']
+    return {
+        'NAME': name,
+        'NAME_UPPER': name.upper(),
+        'FIRST_NAME': name.split()[0] if name.split() else name,
+        'EMAIL': recipient['email'],
+    }
+
+
+class _TextExtractor(HTMLParser):
+    """Collects readable text from an HTML email, roughly as a mail client would show it."""
+
+    BLOCK_TAGS = {'p', 'div', 'table', 'tr', 'h1', 'h2', 'h3', 'h4', 'ul', 'ol', 'li', 'body'}
+    SKIP_TAGS = {'head', 'style', 'script', 'title'}
+    VOID_TAGS = {'br', 'img', 'meta', 'link', 'hr', 'input'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.skip_stack = []
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        style = (attrs.get('style') or '').replace(' ', '').lower()
+        if self.skip_stack:
+            if tag not in self.VOID_TAGS:
+                self.skip_stack.append(tag)
+            return
+        if tag in self.SKIP_TAGS or 'display:none' in style:
+            self.skip_stack.append(tag)
+            return
+        if tag == 'br':
+            self.out.append('\n')
+        elif tag in self.BLOCK_TAGS:
+            self.out.append('\n\n' if tag in ('p', 'h1', 'h2', 'h3', 'h4', 'table') else '\n')
+            if tag == 'li':
+                self.out.append('- ')
+        elif tag == 'a':
+            self.links.append(attrs.get('href'))
+        elif tag == 'img' and attrs.get('alt') and not (attrs.get('src') or '').startswith('cid:'):
+            self.out.append(f"[{attrs['alt']}]")
+
+    def handle_endtag(self, tag):
+        if self.skip_stack:
+            if self.skip_stack[-1] == tag:
+                self.skip_stack.pop()
+            return
+        if tag == 'a' and self.links:
+            href = self.links.pop()
+            if href and href.startswith(('http://', 'https://', 'mailto:')):
+                self.out.append(f"{' ' if self.out and not self.out[-1].endswith(' ') else ''}({href})")
+        elif tag in self.BLOCK_TAGS:
+            self.out.append('\n')
+
+    def handle_data(self, data):
+        if not self.skip_stack:
+            self.out.append(re.sub(r'\s+', ' ', data))
+
+    def text(self):
+        lines = [line.strip() for line in ''.join(self.out).split('\n')]
+        text = '\n'.join(lines)
+        return re.sub(r'\n{3,}', '\n\n', text).strip() + '\n'
+
+
+def html_to_text(html_source):
+    """Convert template HTML to plain text, keeping {{PLACEHOLDER}} fields intact."""
+    parser = _TextExtractor()
+    parser.feed(html_source)
+    parser.close()
+    return parser.text()
+
+
+def render_variant(variant, recipient):
+    """Render (subject, text, html) for one recipient in a single pass over the values."""
+    values = recipient_values(recipient)
+    escaped = {k: html.escape(v) for k, v in values.items()}
+    return (render(variant['subject'], values), render(variant['text'], values),
+            render(variant['html'], escaped))
+
+
+def load_template_source(template, base_dir):
+    """Return the HTML text for a builtin:<name> reference or a template file path."""
+    if template.startswith('builtin:'):
+        from send_invitations import CARD_TEMPLATE, get_html_template
+        builtins = {'card': CARD_TEMPLATE, 'premium': get_html_template("{{NAME}}")}
+        key = template.split(':', 1)[1]
+        if key not in builtins:
+            raise ValueError(f"Unknown builtin template '{template}'")
+        return builtins[key]
+    path = template if os.path.isabs(template) else os.path.join(base_dir, template)
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def load_campaign(path=None):
+    """
+    Load and compile a campaign file (default: CAMPAIGN_FILE env var, else the
+    built-in single-variant campaign).
+    """
+    path = path or os.getenv('CAMPAIGN_FILE')
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            definition = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(path))
+    else:
+        definition = DEFAULT_CAMPAIGN
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+
+    variants = []
+    for variant in definition['variants']:
+        weight = int(variant.get('weight', 1))
+        if weight <= 0:
+            continue
+        source = load_template_source(variant['template'], base_dir)
+        variants.append({
+            'name': variant['name'],
+            'subject': compile_template(variant['subject']),
+            'html': compile_template(source),
+            'text': compile_template(html_to_text(source)),
+            'weight': weight,
+        })
+    if not variants:
+        raise ValueError("Campaign has no variants with a positive weight")
+
+    campaign = {'name': definition.get('name', 'campaign'), 'variants': variants,
+                'total_weight': sum(v['weight'] for v in variants)}
+    return campaign
+
+
+def pick_variant(campaign, email):
+    """Deterministically assign a recipient to a variant, proportional to weights."""
+    variants = campaign['variants']
+    if len(variants) == 1:
+        return variants[0]
+    digest = hashlib.sha256(f"{campaign['name']}:{email.strip().lower()}".encode('utf-8')).digest()
+    bucket = int.from_bytes(digest[:8], 'big') % campaign['total_weight']
+    for variant in variants:
+        bucket -= variant['weight']
+        if bucket < 0:
+            return variant
+    return variants[-1]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python campaign.py campaign.json [recipients.xlsx]")
+        print("       python campaign.py --text template.html   (show the plain-text version)")
+        sys.exit(1)
+    if sys.argv[1] == "--text":
+        print(html_to_text(load_template_source(sys.argv[2], os.getcwd())))
+        sys.exit(0)
+    campaign = load_campaign(sys.argv[1])
+    print(f"✅ Campaign '{campaign['name']}' compiled with {len(campaign['variants'])} variant(s):")
+    for v in campaign['variants']:
+        print(f"   - {v['name']} (weight {v['weight']}, fields: {', '.join(sorted(set(v['html'][1]))) or 'none'})")
+    if len(sys.argv) > 2:
+        from send_invitations import read_recipients_from_excel
+        recipients = read_recipients_from_excel(sys.argv[2]) or []
+        split = Counter(pick_variant(campaign, r['email'])['name'] for r in recipients)
+        print(f"\n📊 Split of {len(recipients)} recipients: "
+              + ", ".join(f"{name}={count}" for name, count in split.items()))
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+DKIM signing (RFC 6376, rsa-sha256, relaxed/relaxed) for outgoing invitations.
+
+Naive per-message signing re-parses the private key and re-canonicalises the
+whole body, which is dominated by the large base64 logo parts that are the
+same in every message. DKIMSigner parses the key once and caches the
+canonicalised bytes of shared inline parts (keyed by Content-ID and payload
+identity), so per message only the recipient-specific pieces are
+canonicalised before hashing.
+
+Configuration (environment):
+    DKIM_PRIVATE_KEY   path to the PEM private key (signing is off if unset)
+    DKIM_SELECTOR      selector published in DNS (default "default")
+    DKIM_DOMAIN        signing domain (default: domain of SMTP_EMAIL)
+
+Requires `cryptography` (in requirements.txt).
+
+Benchmark:
+    python dkim_signing.py bench --key dkim_private.pem --count 500
+"""
+
+import argparse
+import base64
+import hashlib
+import os
+import re
+import threading
+import time
+from email.utils import formatdate, make_msgid
+
+SIGNED_HEADERS = ('from', 'to', 'subject', 'date', 'message-id', 'mime-version', 'content-type')
+
+_WSP_RUN = re.compile(rb'[ \t]+')
+_WSP_EOL = re.compile(rb' \r\n')
+_TRAILING_CRLF = re.compile(rb'(?:\r\n)+\Z')
+
+
+def serialize_message(msg):
+    """
+    CRLF bytes of a message (or part) under its own policy. The messages built
+    by send_invitations.py use compat32, which RFC 2047-encodes non-ASCII
+    headers such as a Subject with the recipient's name; policy.SMTP would
+    raise UnicodeEncodeError on them instead.
+    """
+    return msg.as_bytes(policy=msg.policy.clone(linesep='\r\n'))
+
+
+def canonicalize_body_lines(data):
+    """Relaxed body canonicalization of complete lines, without the end-of-body rule."""
+    return _WSP_EOL.sub(b'\r\n', _WSP_RUN.sub(b' ', data))
+
+
+def finish_body(chunks):
+    """Apply the end-of-body rule (exactly one trailing CRLF) across canonical chunks."""
+    chunks = list(chunks)
+    while chunks and not chunks[-1].strip(b'\r\n'):
+        chunks.pop()
+    if not chunks:
+        return chunks
+    last = _TRAILING_CRLF.sub(b'', chunks[-1])
+    chunks[-1] = last + b'\r\n'
+    return chunks
+
+
+def canonicalize_header(name, value):
+    """Relaxed header canonicalization: 'name:value' with unfolded, compressed value."""
+    value = re.sub(rb'\r\n', b'', value)
+    value = _WSP_RUN.sub(b' ', value).strip(b' ')
+    return name.strip().lower() + b':' + value
+
+
+def split_headers(header_block):
+    """Split a raw CRLF header block into [(name, raw_value)] preserving order."""
+    headers = []
+    for line in header_block.split(b'\r\n'):
+        if line[:1] in (b' ', b'\t') and headers:
+            name, value = headers[-1]
+            headers[-1] = (name, value + b'\r\n' + line)
+        elif line:
+            name, _, value = line.partition(b':')
+            headers.append((name, value))
+    return headers
+
+
+def load_private_key(path):
+    try:
+        from cryptography.hazmat.primitives import serialization
+    except ImportError:
+        raise RuntimeError("DKIM signing needs the 'cryptography' package: pip install cryptography")
+    with open(path, 'rb') as f:
+        return serialization.load_pem_private_key(f.read(), password=None)
+
+
+class DKIMSigner:
+    """Signs serialized messages with a key parsed once at construction."""
+
+    def __init__(self, domain, selector, key_path, signed_headers=SIGNED_HEADERS):
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+
+        self.domain = domain
+        self.selector = selector
+        self.signed_headers = signed_headers
+        self._key = load_private_key(key_path)
+        self._padding = padding.PKCS1v15()
+        self._hash = hashes.SHA256()
+        self._static = {}  # cid -> (payload object, serialized lines, canonical lines)
+        self._lock = threading.Lock()
+
+    def _static_segment(self, part):
+        """Serialized and canonicalised bytes of a shared inline part, computed once."""
+        cid = part.get('Content-ID')
+        payload = part.get_payload()
+        cached = self._static.get(cid)
+        if cached is None or cached[0] is not payload:
+            raw = serialize_message(part)
+            raw = raw[:raw.rfind(b'\r\n') + 2]  # whole lines only
+            cached = (payload, raw, canonicalize_body_lines(raw))
+            with self._lock:
+                self._static[cid] = cached
+        return cached[1], cached[2]
+
+    def body_hash(self, body, static_parts=()):
+        """
+        SHA-256 of the relaxed-canonical body. Regions matching the given shared
+        parts reuse their cached canonical form; everything else is
+        canonicalised here. Shared parts are MIME parts or already serialized
+        (raw, canonical) byte pairs.
+        """
+        chunks = []
+        pos = 0
+        for part in static_parts:
+            raw, canonical = part if isinstance(part, tuple) else self._static_segment(part)
+            start = body.find(raw, pos)
+            # Only reuse segments that start at a line boundary
+            if start < 0 or (start > 0 and body[start - 2:start] != b'\r\n'):
+                continue
+            chunks.append(canonicalize_body_lines(body[pos:start]))
+            chunks.append(canonical)
+            pos = start + len(raw)
+        tail = body[pos:]
+        if tail and not tail.endswith(b'\r\n'):
+            tail += b'\r\n'
+        chunks.append(canonicalize_body_lines(tail))
+
+        h = hashlib.sha256()
+        for chunk in finish_body(chunks):
+            h.update(chunk)
+        return base64.b64encode(h.digest())
+
+    def sign(self, data, static_parts=()):
+        """Return `data` (CRLF-serialized message bytes) with a DKIM-Signature prepended."""
+        header_block, _, body = data.partition(b'\r\n\r\n')
+        headers = split_headers(header_block)
+        body_hash = self.body_hash(body, static_parts)
+
+        # Sign each listed header that is present (last instance first, per RFC 6376)
+        remaining = list(headers)
+        signed_names, canonical = [], []
+        for wanted in self.signed_headers:
+            for i in range(len(remaining) - 1, -1, -1):
+                name, value = remaining[i]
+                if name.strip().lower() == wanted.encode():
+                    canonical.append(canonicalize_header(name, value) + b'\r\n')
+                    signed_names.append(wanted)
+                    del remaining[i]
+                    break
+
+        tags = (f"v=1; a=rsa-sha256; c=relaxed/relaxed; d={self.domain}; s={self.selector}; "
+                f"t={int(time.time())}; h={':'.join(signed_names)}; bh={body_hash.decode()}; b=")
+        to_sign = b''.join(canonical) + canonicalize_header(b'DKIM-Signature', b' ' + tags.encode())
+        signature = self._key.sign(to_sign, self._padding, self._hash)
+        header = f"DKIM-Signature: {tags}{base64.b64encode(signature).decode()}\r\n".encode()
+        return header + data
+
+    def sign_message(self, msg):
+        """Serialize and sign a MIME message, adding Date and Message-ID if missing."""
+        if 'Date' not in msg:
+            msg['Date'] = formatdate(localtime=True)
+        if 'Message-ID' not in msg:
+            msg['Message-ID'] = make_msgid(domain=self.domain)
+        static_parts = []
+        if msg.is_multipart():
+            static_parts = [p for p in msg.get_payload()
+                            if p.get('Content-ID') and isinstance(p.get_payload(), str)]
+        return self.sign(serialize_message(msg), static_parts)
+
+
+def load_dkim_signer(sender_email=None):
+    """Build a signer from DKIM_* environment variables, or None if not configured."""
+    key_path = os.getenv('DKIM_PRIVATE_KEY')
+    if not key_path:
+        return None
+    domain = os.getenv('DKIM_DOMAIN') or (sender_email or '').rpartition('@')[2]
+    return DKIMSigner(domain, os.getenv('DKIM_SELECTOR', 'default'), key_path)
+
+
+def naive_sign(message_bytes, domain, selector, key_path):
+    """Reference signer: re-reads the key and canonicalises everything per message."""
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import padding
+
+    key = load_private_key(key_path)
+    header_block, _, body = message_bytes.partition(b'\r\n\r\n')
+    canonical_body = b''.join(finish_body([canonicalize_body_lines(body + b'\r\n')]))
+    body_hash = base64.b64encode(hashlib.sha256(canonical_body).digest()).decode()
+    headers = {name.strip().lower(): (name, value) for name, value in split_headers(header_block)}
+    names = [h for h in SIGNED_HEADERS if h.encode() in headers]
+    tags = (f"v=1; a=rsa-sha256; c=relaxed/relaxed; d={domain}; s={selector}; "
+            f"t={int(time.time())}; h={':'.join(names)}; bh={body_hash}; b=")
+    to_sign = b''.join(canonicalize_header(*headers[n.encode()]) + b'\r\n' for n in names)
+    to_sign += canonicalize_header(b'DKIM-Signature', b' ' + tags.encode())
+    signature = key.sign(to_sign, padding.PKCS1v15(), hashes.SHA256())
+    return f"DKIM-Signature: {tags}{base64.b64encode(signature).decode()}\r\n".encode() + message_bytes
+
+
+def benchmark(key_path, count, domain="example.com", selector="default"):
+    """Print signatures per second for the naive and cached signers."""
+    from send_invitations import build_invitation_message, load_logos_for_email
+
+    logos = load_logos_for_email()
+    smtp_config = {'email': f"sender@{domain}"}
+    signer = DKIMSigner(domain, selector, key_path)
+    messages = []
+    for i in range(count):
+        msg, _ = build_invitation_message({'email': f"user{i}@example.org", 'name': f"User {i}"},
+                                          smtp_config, logos)
+        msg['Date'] = formatdate(localtime=True)
+        msg['Message-ID'] = make_msgid(domain=domain)
+        messages.append(msg)
+    serialized = [serialize_message(m) for m in messages]
+
+    started = time.perf_counter()
+    for data in serialized:
+        naive_sign(data, domain, selector, key_path)
+    naive = count / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for msg, data in zip(messages, serialized):
+        signer.sign(data, [p for p in msg.get_payload() if p.get('Content-ID')])
+    cached = count / (time.perf_counter() - started)
+
+    body_kb = len(serialized[0]) / 1024
+    print(f"✍️  DKIM signing, {count} messages of {body_kb:.0f} KB:")
+    print(f"   naive (key + full body per message): {naive:8.1f} signatures/sec")
+    print(f"   cached key + shared-part body cache: {cached:8.1f} signatures/sec ({cached / naive:.1f}x)")
+    return naive, cached
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DKIM signing utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench = sub.add_parser("bench", help="Benchmark signing throughput")
+    bench.add_argument("--key", required=True, help="PEM private key")
+    bench.add_argument("--count", type=int, default=200)
+    bench.add_argument("--domain", default="example.com")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        benchmark(args.key, args.count, args.domain)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Output encoding for generated invitation images.
+
+Large attachments slow down SMTP DATA and count against provider size quotas,
+so generated images go through a small pipeline: optional downscaling to a
+maximum dimension, then PNG (optimized), palette PNG, JPEG or WebP encoding at
+a target quality, optionally progressive.
+
+Settings come from the environment:
+    INVITE_IMAGE_FORMAT       png | png8 | jpeg | webp   (default png)
+    INVITE_IMAGE_MAX_DIM      longest side in pixels, 0 = keep (default 0)
+    INVITE_IMAGE_QUALITY      JPEG/WebP quality 1-100     (default 85)
+    INVITE_IMAGE_COLORS       palette size for png8       (default 256)
+    INVITE_IMAGE_PROGRESSIVE  1 for progressive/interlaced output (default 0)
+
+Compare bytes-per-message for different settings:
+    python image_output.py Congratulations.png --name "Sample Name"
+"""
+
+import argparse
+import io
+import os
+
+from PIL import Image
+
+FORMATS = {
+    # format: (PIL format, MIME subtype, file extension)
+    'png': ('PNG', 'png', 'png'),
+    'png8': ('PNG', 'png', 'png'),
+    'jpeg': ('JPEG', 'jpeg', 'jpg'),
+    'webp': ('WEBP', 'webp', 'webp'),
+}
+
+
+def get_image_output_settings():
+    """Read image output settings from environment variables."""
+    settings = {
+        'format': os.getenv('INVITE_IMAGE_FORMAT', 'png').lower(),
+        'max_dim': int(os.getenv('INVITE_IMAGE_MAX_DIM', '0')),
+        'quality': int(os.getenv('INVITE_IMAGE_QUALITY', '85')),
+        'colors': int(os.getenv('INVITE_IMAGE_COLORS', '256')),
+        'progressive': os.getenv('INVITE_IMAGE_PROGRESSIVE', '0') in ('1', 'true', 'yes'),
+    }
+    if settings['format'] == 'jpg':
+        settings['format'] = 'jpeg'
+    if settings['format'] not in FORMATS:
+        raise ValueError(f"Unsupported INVITE_IMAGE_FORMAT '{settings['format']}'")
+    return settings
+
+
+# Settings that change the encoded bytes, per format
+OUTPUT_KEYS = {
+    'png': ('max_dim', 'progressive'),
+    'png8': ('max_dim', 'colors', 'progressive'),
+    'jpeg': ('max_dim', 'quality', 'progressive'),
+    'webp': ('max_dim', 'quality'),
+}
+
+
+def settings_id(settings):
+    """
+    Stable string identifying the output the settings produce, for use in
+    cache keys. Settings the format ignores (e.g. quality for PNG) are left
+    out so identical images share one cache entry.
+    """
+    keys = OUTPUT_KEYS[settings['format']]
+    return ",".join([f"format={settings['format']}"] + [f"{k}={settings[k]}" for k in keys])
+
+
+def flatten_alpha(img, background=(255, 255, 255)):
+    """Composite an image with transparency onto a solid background (RGB result)."""
+    if img.mode == 'P' and 'transparency' in img.info:
+        img = img.convert('RGBA')
+    if img.mode in ('RGBA', 'LA'):
+        img = img.convert('RGBA')
+        flat = Image.new('RGB', img.size, background)
+        flat.paste(img, mask=img.getchannel('A'))
+        return flat
+    return img.convert('RGB') if img.mode != 'RGB' else img
+
+
+def encode_image(img, settings):
+    """
+    Encode a PIL image according to `settings`.
+    Returns (data, mime_subtype, extension).
+    """
+    pil_format, subtype, ext = FORMATS[settings['format']]
+
+    if settings['max_dim'] and max(img.size) > settings['max_dim']:
+        img = img.copy()
+        img.thumbnail((settings['max_dim'], settings['max_dim']), Image.LANCZOS)
+
+    save_args = {}
+    if settings['format'] == 'png':
+        save_args = {'optimize': True}
+    elif settings['format'] == 'png8':
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+        method = Image.Quantize.FASTOCTREE if img.mode == 'RGBA' else Image.Quantize.MEDIANCUT
+        img = img.quantize(colors=settings['colors'], method=method)
+        save_args = {'optimize': True}
+    elif settings['format'] == 'jpeg':
+        # JPEG has no alpha; transparent areas become white, not black
+        img = flatten_alpha(img)
+        save_args = {'quality': settings['quality'], 'optimize': True}
+    else:
+        save_args = {'quality': settings['quality'], 'method': 4}
+
+    if settings['progressive']:
+        if pil_format == 'JPEG':
+            save_args['progressive'] = True
+        elif pil_format == 'PNG':
+            save_args['interlace'] = 1
+
+    buffer = io.BytesIO()
+    img.save(buffer, format=pil_format, **save_args)
+    return buffer.getvalue(), subtype, ext
+
+
+def base64_size(num_bytes):
+    """Bytes an attachment of `num_bytes` adds to a message (base64, 76-char lines)."""
+    encoded = (num_bytes + 2) // 3 * 4
+    return encoded + (encoded + 75) // 76
+
+
+def main():
+    # Imported here so the pipeline itself has no dependency on the sender
+    from send_invitations import find_invitation_font, render_invitation_image
+
+    parser = argparse.ArgumentParser(description="Compare invitation image output sizes")
+    parser.add_argument("template", nargs="?", default="Congratulations.png")
+    parser.add_argument("--name", default="Sample Name")
+    parser.add_argument("--max-dim", type=int, default=1200)
+    parser.add_argument("--quality", type=int, default=80)
+    args = parser.parse_args()
+
+    img = render_invitation_image(args.name, args.template, find_invitation_font())
+    baseline = io.BytesIO()
+    img.save(baseline, format="PNG")
+    before = base64_size(len(baseline.getvalue()))
+    print(f"📐 Source {img.size[0]}x{img.size[1]}, default PNG: {before / 1024:.1f} KB per message")
+
+    candidates = [
+        {'format': 'png', 'max_dim': 0, 'quality': args.quality, 'colors': 256, 'progressive': False},
+        {'format': 'png', 'max_dim': args.max_dim, 'quality': args.quality, 'colors': 256, 'progressive': False},
+        {'format': 'png8', 'max_dim': args.max_dim, 'quality': args.quality, 'colors': 256, 'progressive': False},
+        {'format': 'jpeg', 'max_dim': args.max_dim, 'quality': args.quality, 'colors': 256, 'progressive': True},
+        {'format': 'webp', 'max_dim': args.max_dim, 'quality': args.quality, 'colors': 256, 'progressive': False},
+    ]
+    for settings in candidates:
+        data, _, _ = encode_image(img, settings)
+        after = base64_size(len(data))
+        print(f"   {settings_id(settings)}: {after / 1024:.1f} KB per message "
+              f"({(1 - after / before) * 100:.0f}% smaller)")
+
+
+if __name__ == "__main__":
+    main()
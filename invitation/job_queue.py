@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Persistent SQLite send queue with scheduled, windowed campaigns.
+
+Campaigns are enqueued with a start time, an optional daily send window and a
+daily cap. Long-running workers lease jobs from the queue and send them at the
+campaign's maximum allowed rate. Several workers (processes or machines sharing
+the database file) can drain the same queue: every job is leased to exactly one
+worker at a time, and expired leases are picked up again by the others.
+
+Usage:
+    python job_queue.py enqueue recipients.xlsx --start "2026-10-20 09:00" \
+        --window 09:00-18:00 --daily-cap 450 --rate 30
+    python job_queue.py worker
+    python job_queue.py status
+"""
+
+import argparse
+import os
+import socket
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+DEFAULT_QUEUE_DB = "send_queue.db"
+DEFAULT_LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaigns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    start_at REAL NOT NULL,
+    window_start TEXT,
+    window_end TEXT,
+    daily_cap INTEGER,
+    rate_per_minute REAL NOT NULL,
+    next_send_at REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    campaign_id INTEGER NOT NULL REFERENCES campaigns(id),
+    email TEXT NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_until REAL,
+    sent_at REAL,
+    last_error TEXT,
+    UNIQUE (campaign_id, email)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs (campaign_id, status, lease_until);
+CREATE INDEX IF NOT EXISTS idx_jobs_sent ON jobs (campaign_id, sent_at);
+"""
+
+
+def open_queue(db_path=DEFAULT_QUEUE_DB):
+    """Open (and create if needed) the queue database."""
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def parse_window(window):
+    """Parse 'HH:MM-HH:MM' into a (start, end) tuple of 'HH:MM' strings."""
+    if not window:
+        return None, None
+    start, end = window.split("-", 1)
+    for part in (start, end):
+        datetime.strptime(part.strip(), "%H:%M")
+    return start.strip(), end.strip()
+
+
+def in_send_window(campaign, now=None):
+    """Return True if `now` falls inside the campaign's daily send window."""
+    if not campaign['window_start'] or not campaign['window_end']:
+        return True
+    current = datetime.fromtimestamp(now or time.time()).strftime("%H:%M")
+    start, end = campaign['window_start'], campaign['window_end']
+    if start <= end:
+        return start <= current < end
+    # Window wraps past midnight, e.g. 22:00-06:00
+    return current >= start or current < end
+
+
+def seconds_until_window(campaign, now=None):
+    """Seconds until the campaign's send window next opens (0 if open now)."""
+    now = now or time.time()
+    if in_send_window(campaign, now):
+        return 0
+    current = datetime.fromtimestamp(now)
+    hour, minute = map(int, campaign['window_start'].split(":"))
+    opens = current.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if opens <= current:
+        opens += timedelta(days=1)
+    return (opens - current).total_seconds()
+
+
+def enqueue_campaign(conn, name, recipients, start_at=None, window=None,
+                     daily_cap=None, rate_per_minute=30):
+    """
+    Create a campaign and enqueue one job per recipient.
+    Duplicate emails within a campaign are ignored. Returns the campaign id.
+    """
+    window_start, window_end = parse_window(window)
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        cur = conn.execute(
+            "INSERT INTO campaigns (name, start_at, window_start, window_end, daily_cap,"
+            " rate_per_minute, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (name, start_at or now, window_start, window_end, daily_cap, rate_per_minute, now),
+        )
+        campaign_id = cur.lastrowid
+        conn.executemany(
+            "INSERT OR IGNORE INTO jobs (campaign_id, email, name) VALUES (?, ?, ?)",
+            ((campaign_id, r['email'], r['name']) for r in recipients),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return campaign_id
+
+
+def _start_of_day(now):
+    return datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+def lease_job(conn, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS, now=None):
+    """
+    Lease the next sendable job for this worker.
+
+    Runs in a single write transaction, so concurrent workers never lease the
+    same row. The campaign's rate limit is shared between workers through its
+    `next_send_at` slot: each lease reserves the next free slot and the caller
+    must wait until `send_at` before sending.
+
+    Returns (job_row, send_at) or (None, seconds_to_wait) if nothing is sendable.
+    """
+    now = now or time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Expired leases go back to the pool
+        conn.execute(
+            "UPDATE jobs SET status = 'pending', lease_owner = NULL, lease_until = NULL"
+            " WHERE status = 'leased' AND lease_until < ?",
+            (now,),
+        )
+        campaigns = conn.execute(
+            "SELECT * FROM campaigns WHERE start_at <= ? AND EXISTS ("
+            " SELECT 1 FROM jobs WHERE jobs.campaign_id = campaigns.id AND jobs.status = 'pending')"
+            " ORDER BY next_send_at, id",
+            (now,),
+        ).fetchall()
+
+        wait = None
+        for campaign in campaigns:
+            window_wait = seconds_until_window(campaign, now)
+            if window_wait:
+                wait = window_wait if wait is None else min(wait, window_wait)
+                continue
+
+            if campaign['daily_cap']:
+                used = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE campaign_id = ? AND"
+                    " ((status = 'sent' AND sent_at >= ?) OR status = 'leased')",
+                    (campaign['id'], _start_of_day(now)),
+                ).fetchone()[0]
+                if used >= campaign['daily_cap']:
+                    tomorrow = _start_of_day(now) + 86400 - now
+                    wait = tomorrow if wait is None else min(wait, tomorrow)
+                    continue
+
+            send_at = max(now, campaign['next_send_at'])
+            slot_wait = seconds_until_window(campaign, send_at)
+            if slot_wait:
+                # The next free slot falls after today's window closes: roll
+                # over to the next window instead of sending outside it
+                opens = send_at + slot_wait - now
+                wait = opens if wait is None else min(wait, opens)
+                continue
+
+            job = conn.execute(
+                "SELECT * FROM jobs WHERE campaign_id = ? AND status = 'pending' ORDER BY id LIMIT 1",
+                (campaign['id'],),
+            ).fetchone()
+            # A rate of 0 means unlimited
+            rate = campaign['rate_per_minute']
+            interval = 60.0 / rate if rate > 0 else 0.0
+            conn.execute(
+                "UPDATE campaigns SET next_send_at = ? WHERE id = ?",
+                (send_at + interval, campaign['id']),
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_until = ?,"
+                " attempts = attempts + 1 WHERE id = ?",
+                (worker_id, send_at + lease_seconds, job['id']),
+            )
+            conn.execute("COMMIT")
+            return job, send_at
+
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    if wait is None:
+        upcoming = conn.execute(
+            "SELECT MIN(start_at) FROM campaigns WHERE start_at > ? AND EXISTS ("
+            " SELECT 1 FROM jobs WHERE jobs.campaign_id = campaigns.id AND jobs.status = 'pending')",
+            (now,),
+        ).fetchone()[0]
+        wait = (upcoming - now) if upcoming else None
+    return None, wait
+
+
+def complete_job(conn, job_id, worker_id):
+    """Mark a leased job as sent. Ignored if the lease was lost to another worker."""
+    conn.execute(
+        "UPDATE jobs SET status = 'sent', sent_at = ?, lease_owner = NULL, lease_until = NULL,"
+        " last_error = NULL WHERE id = ? AND lease_owner = ?",
+        (time.time(), job_id, worker_id),
+    )
+
+
+def fail_job(conn, job_id, worker_id, error, transient=True, max_attempts=MAX_ATTEMPTS):
+    """
+    Return a transiently failed job to the queue, or mark it failed: at once
+    for permanent (5xx) failures, otherwise after `max_attempts`.
+    """
+    conn.execute(
+        "UPDATE jobs SET status = CASE WHEN ? OR attempts >= ? THEN 'failed' ELSE 'pending' END,"
+        " lease_owner = NULL, lease_until = NULL, last_error = ? WHERE id = ? AND lease_owner = ?",
+        (not transient, max_attempts, error, job_id, worker_id),
+    )
+
+
+def queue_status(conn):
+    """Return per-campaign job counts by status."""
+    return conn.execute(
+        "SELECT c.id, c.name, j.status, COUNT(*) AS count FROM campaigns c"
+        " JOIN jobs j ON j.campaign_id = c.id GROUP BY c.id, j.status ORDER BY c.id, j.status"
+    ).fetchall()
+
+
+def run_worker(db_path=DEFAULT_QUEUE_DB, worker_id=None, idle_exit=False, poll_seconds=30):
+    """
+    Drain the queue, sending each leased job with send_single_email over one
+    reused SMTP connection. The worker session is recorded as a run in the
+    run log, with one result per job that reached a final outcome.
+    """
+    # Imported here so enqueue/status do not pay for PIL/openpyxl imports
+    from run_log import RunRecorder, open_run_log, start_run
+    from send_invitations import (get_invite_template, get_smtp_config,
+                                  load_logos_for_email, send_single_email)
+    from smtp_pool import SMTPPool
+
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    conn = open_queue(db_path)
+    smtp_config = get_smtp_config()
+    logos = load_logos_for_email()
+    invite_template = get_invite_template()
+    pool = SMTPPool(smtp_config, size=1)
+    run_log = open_run_log()
+    run_id = start_run(run_log, source=db_path, mode=f"queue worker {worker_id}")
+    recorder = RunRecorder(run_log, run_id)
+    sent = 0
+
+    print(f"👷 Worker {worker_id} draining {db_path} (run #{run_id} in the run log)")
+    try:
+        while True:
+            job, when = lease_job(conn, worker_id)
+            if job is None:
+                if when is None and idle_exit:
+                    print(f"✅ Queue empty, worker {worker_id} exiting after {sent} sends")
+                    return sent
+                time.sleep(min(when or poll_seconds, poll_seconds))
+                continue
+
+            delay = when - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+            result = send_single_email({'email': job['email'], 'name': job['name']},
+                                       smtp_config, logos, job['id'], '*', invite_template, pool=pool)
+            # The row was read before lease_job counted this attempt
+            attempts = job['attempts'] + 1
+            if result['status'] == 'success':
+                complete_job(conn, job['id'], worker_id)
+                recorder.record(result, attempts=attempts)
+                sent += 1
+                continue
+            transient = result.get('transient', False)
+            fail_job(conn, job['id'], worker_id, result.get('error', 'Unknown error'), transient)
+            if not transient or attempts >= MAX_ATTEMPTS:
+                recorder.record(result, attempts=attempts)
+    finally:
+        recorder.close()
+        run_log.close()
+        pool.close()
+
+
+def non_negative_rate(value):
+    rate = float(value)
+    if rate < 0:
+        raise argparse.ArgumentTypeError("rate must be 0 (unlimited) or positive")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scheduled invitation send queue")
+    parser.add_argument("--db", default=DEFAULT_QUEUE_DB, help="Queue database path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = sub.add_parser("enqueue", help="Enqueue a campaign from an Excel file")
+    enqueue.add_argument("excel_file")
+    enqueue.add_argument("--name", help="Campaign name (default: file name)")
+    enqueue.add_argument("--start", help="Start time 'YYYY-MM-DD HH:MM' (default: now)")
+    enqueue.add_argument("--window", help="Daily send window 'HH:MM-HH:MM'")
+    enqueue.add_argument("--daily-cap", type=int, help="Maximum sends per calendar day")
+    enqueue.add_argument("--rate", type=non_negative_rate, default=30,
+                         help="Maximum sends per minute (default 30, 0 = unlimited)")
+
+    worker = sub.add_parser("worker", help="Run a worker that drains the queue")
+    worker.add_argument("--id", help="Worker id (default: host:pid)")
+    worker.add_argument("--exit-when-idle", action="store_true",
+                        help="Exit once no campaign has pending or scheduled jobs")
+
+    sub.add_parser("status", help="Show queue status")
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        from send_invitations import read_recipients_from_excel
+
+        recipients = read_recipients_from_excel(args.excel_file)
+        if not recipients:
+            print("\n❌ No valid recipients found in the Excel file!")
+            sys.exit(1)
+        start_at = datetime.strptime(args.start, "%Y-%m-%d %H:%M").timestamp() if args.start else None
+        conn = open_queue(args.db)
+        campaign_id = enqueue_campaign(conn, args.name or os.path.basename(args.excel_file),
+                                       recipients, start_at, args.window, args.daily_cap, args.rate)
+        print(f"✅ Enqueued campaign #{campaign_id} with {len(recipients)} recipients")
+    elif args.command == "worker":
+        run_worker(args.db, args.id, idle_exit=args.exit_when_idle)
+    else:
+        rows = queue_status(open_queue(args.db))
+        if not rows:
+            print("📭 Queue is empty")
+        for row in rows:
+            print(f"   #{row['id']} {row['name']}: {row['status']} = {row['count']}")
+
+
+if __name__ == "__main__":
+    main()
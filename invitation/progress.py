@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Live single-line progress view for send runs.
+
+Workers report outcomes with `emit()`, which only appends a tuple to a deque
+(atomic in CPython, no locks), so reporting costs well under a microsecond per
+message. A background thread drains the events a few times per second and
+redraws one status line with sent/failed counts, the number of sends
+waiting for a retry, a moving-window messages/sec, ETA and the current
+limiter state. Failure details are printed above the status line so they
+never interleave with it.
+"""
+
+import sys
+import threading
+import time
+from collections import deque
+
+RATE_WINDOW_SECONDS = 30
+
+
+def format_duration(seconds):
+    """Format seconds as H:MM:SS or M:SS."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class ProgressView:
+    """Aggregates worker events and renders a live status line."""
+
+    def __init__(self, total, limiter_state=None, stream=None, interval=0.5):
+        self.total = total
+        self.limiter_state = limiter_state
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self.interactive = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self.sent = 0
+        self.failed = 0
+        self.retrying = 0
+        self._retrying = set()  # emails whose last attempt asked for a retry
+        self._events = deque()
+        self._window = deque()
+        self._started = None
+        self._last_plain = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def emit(self, kind, email=None, detail=None):
+        """Report an event: 'sent', 'failed' or 'retry'. Safe from any thread."""
+        self._events.append((kind, time.monotonic(), email, detail))
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="progress", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._render(final=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._render()
+
+    def _drain(self):
+        messages = []
+        events = self._events
+        while events:
+            kind, at, email, detail = events.popleft()
+            if kind == 'sent':
+                self.sent += 1
+                self._window.append(at)
+                self._retrying.discard(email)
+            elif kind == 'failed':
+                self.failed += 1
+                messages.append(f"❌ Failed to send to {email}: {detail}")
+                self._retrying.discard(email)
+            elif kind == 'retry':
+                self._retrying.add(email)
+                messages.append(f"🔁 Retrying {email}: {detail}")
+        # Sends currently waiting for another attempt, not total retry attempts
+        self.retrying = len(self._retrying)
+        return messages
+
+    def snapshot(self):
+        """Current counters, rate (msgs/sec over the window) and ETA in seconds."""
+        now = time.monotonic()
+        while self._window and self._window[0] < now - RATE_WINDOW_SECONDS:
+            self._window.popleft()
+        elapsed = min(now - (self._started or now), RATE_WINDOW_SECONDS)
+        rate = len(self._window) / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - self.sent - self.failed
+        eta = remaining / rate if rate > 0 else None
+        return {'sent': self.sent, 'failed': self.failed, 'retrying': self.retrying,
+                'rate': rate, 'eta': eta, 'remaining': remaining}
+
+    def _render(self, final=False):
+        messages = self._drain()
+        stats = self.snapshot()
+        eta = format_duration(stats['eta']) if stats['eta'] is not None else "--:--"
+        line = (f"📬 {stats['sent'] + stats['failed']}/{self.total}  ✅ {stats['sent']}  "
+                f"❌ {stats['failed']}  🔁 {stats['retrying']}  "
+                f"{stats['rate']:.1f} msg/s  ETA {eta}")
+        if self.limiter_state:
+            line += f"  ⚙️  {self.limiter_state()}"
+
+        out = self.stream
+        if self.interactive:
+            for message in messages:
+                out.write(f"\r\033[K{message}\n")
+            out.write(f"\r\033[K{line}")
+            if final:
+                out.write("\n")
+        else:
+            for message in messages:
+                out.write(message + "\n")
+            # Plain output (logs, pipes): one status line every 10 seconds
+            now = time.monotonic()
+            if final or now - self._last_plain >= 10:
+                out.write(line + "\n")
+                self._last_plain = now
+        out.flush()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Indexed SQLite log of every send run.
+
+Each run of send_invitations.py adds a row to `runs` and one row per
+recipient to `results` (status, SMTP code, error, campaign variant, attempts
+and the time spent in the SMTP transaction). Results are indexed by email,
+status, SMTP code and send time, so questions about a 100k-recipient run are
+answered in milliseconds:
+
+    python run_log.py runs                     # recent runs with counts
+    python run_log.py failures                 # failures by SMTP code (latest run)
+    python run_log.py slowest --limit 100      # slowest sends
+    python run_log.py lookup someone@example.com
+    python run_log.py failed-emails --run 3 > retry.txt
+    python run_log.py import shard_journal_20261019_090000_run12.jsonl
+
+Sharded runs (shard_coordinator.py) are recorded here too; `import` loads
+older journals.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+DEFAULT_RUN_LOG = "run_log.db"
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    source TEXT,
+    campaign TEXT,
+    mode TEXT,
+    host TEXT,
+    total INTEGER,
+    sent INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    email TEXT NOT NULL,
+    status TEXT NOT NULL,
+    variant TEXT,
+    smtp_code INTEGER,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    elapsed REAL,
+    attachment TEXT,
+    sent_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_email ON results (email);
+CREATE INDEX IF NOT EXISTS idx_results_status ON results (run_id, status);
+CREATE INDEX IF NOT EXISTS idx_results_code ON results (run_id, smtp_code);
+CREATE INDEX IF NOT EXISTS idx_results_elapsed ON results (run_id, elapsed);
+"""
+
+
+def open_run_log(db_path=DEFAULT_RUN_LOG):
+    """Open (and create if needed) the run log database."""
+    # Writers on several threads (shard_coordinator's pumps) serialise access themselves
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def start_run(conn, source=None, campaign=None, mode=None, total=None, host=None, started_at=None):
+    """Register a new run and return its id."""
+    cursor = conn.execute(
+        "INSERT INTO runs (started_at, source, campaign, mode, host, total) VALUES (?, ?, ?, ?, ?, ?)",
+        (started_at or time.time(), source, campaign, mode, host or socket.gethostname(), total))
+    conn.commit()
+    return cursor.lastrowid
+
+
+def finish_run(conn, run_id, finished_at=None):
+    """Close a run and store its sent/failed counts."""
+    conn.execute(
+        "UPDATE runs SET finished_at = ?,"
+        " sent = (SELECT COUNT(*) FROM results WHERE run_id = ? AND status = 'success'),"
+        " failed = (SELECT COUNT(*) FROM results WHERE run_id = ? AND status != 'success')"
+        " WHERE id = ?", (finished_at or time.time(), run_id, run_id, run_id))
+    conn.commit()
+
+
+class RunRecorder:
+    """Buffers send results and writes them to the run log in batches."""
+
+    def __init__(self, conn, run_id, batch_size=BATCH_SIZE):
+        self.conn = conn
+        self.run_id = run_id
+        self.batch_size = batch_size
+        self._pending = []
+
+    def record(self, result, attempts=1, sent_at=None):
+        """Add one result dict as returned by send_single_email."""
+        self._pending.append((
+            self.run_id, result['email'], result['status'], result.get('variant'),
+            result.get('smtp_code'), result.get('error'), attempts, result.get('elapsed'),
+            result.get('attachment'), sent_at or time.time()))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self.conn.executemany(
+                "INSERT INTO results (run_id, email, status, variant, smtp_code, error, attempts,"
+                " elapsed, attachment, sent_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._pending)
+            self.conn.commit()
+            self._pending = []
+
+    def close(self):
+        self.flush()
+        finish_run(self.conn, self.run_id)
+
+
+def latest_run_id(conn):
+    row = conn.execute("SELECT MAX(id) FROM runs").fetchone()
+    return row[0]
+
+
+def list_runs(conn, limit=20):
+    return conn.execute("SELECT * FROM runs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+
+
+def failures_by_code(conn, run_id):
+    """Failed sends grouped by SMTP code, with one example error each."""
+    return conn.execute(
+        "SELECT smtp_code, COUNT(*) AS count, MIN(error) AS example FROM results"
+        " WHERE run_id = ? AND status != 'success' GROUP BY smtp_code ORDER BY count DESC",
+        (run_id,)).fetchall()
+
+
+def slowest_sends(conn, run_id, limit=100):
+    return conn.execute(
+        "SELECT email, status, smtp_code, elapsed, attempts FROM results"
+        " WHERE run_id = ? AND elapsed IS NOT NULL ORDER BY elapsed DESC LIMIT ?",
+        (run_id, limit)).fetchall()
+
+
+def lookup_email(conn, email):
+    """Every recorded send to an address, newest first."""
+    return conn.execute(
+        "SELECT run_id, status, smtp_code, error, variant, elapsed, sent_at FROM results"
+        " WHERE email = ? ORDER BY sent_at DESC", (email,)).fetchall()
+
+
+def failed_emails(conn, run_id):
+    return [row[0] for row in conn.execute(
+        "SELECT email FROM results WHERE run_id = ? AND status != 'success' ORDER BY id", (run_id,))]
+
+
+def import_journal(conn, path):
+    """Load a JSON-lines journal (shard_coordinator.py) as a new run. Returns the run id."""
+    run_id = start_run(conn, source=path, mode="imported journal", host="")
+    recorder = RunRecorder(conn, run_id)
+    first = last = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('type', 'result') != 'result':
+                continue
+            sent_at = datetime.fromisoformat(record['timestamp']).timestamp() if record.get('timestamp') else None
+            if sent_at:
+                first = min(first or sent_at, sent_at)
+                last = max(last or sent_at, sent_at)
+            recorder.record(record, sent_at=sent_at)
+    recorder.flush()
+    finish_run(conn, run_id, finished_at=last)
+    if first:
+        conn.execute("UPDATE runs SET started_at = ? WHERE id = ?", (first, run_id))
+        conn.commit()
+    return run_id
+
+
+def _when(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp else '-'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the send run log")
+    parser.add_argument("--db", default=DEFAULT_RUN_LOG, help="Run log path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    runs = sub.add_parser("runs", help="List recent runs")
+    runs.add_argument("--limit", type=int, default=20)
+    for name, help_text in (("failures", "Failures grouped by SMTP code"), ("slowest", "Slowest sends"),
+                            ("failed-emails", "Addresses that failed, one per line")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--run", type=int, help="Run id (default: latest)")
+        if name == "slowest":
+            p.add_argument("--limit", type=int, default=100)
+    lookup = sub.add_parser("lookup", help="Send history of an address")
+    lookup.add_argument("email")
+    imp = sub.add_parser("import", help="Import a shard journal as a run")
+    imp.add_argument("journals", nargs="+")
+    args = parser.parse_args()
+
+    if args.command != "import" and not os.path.exists(args.db):
+        print(f"📭 No run log at {args.db} yet")
+        sys.exit(1)
+    conn = open_run_log(args.db)
+    run_id = getattr(args, 'run', None) or latest_run_id(conn)
+
+    if args.command == "runs":
+        for row in list_runs(conn, args.limit):
+            duration = f"{row['finished_at'] - row['started_at']:.0f}s" if row['finished_at'] else "running"
+            print(f"   #{row['id']} {_when(row['started_at'])}  {row['source'] or '-'}"
+                  f"  ✅ {row['sent']}  ❌ {row['failed']}  {duration}  {row['mode'] or ''}")
+    elif args.command == "failures":
+        rows = failures_by_code(conn, run_id)
+        print(f"❌ Failures in run #{run_id}: {sum(r['count'] for r in rows)}")
+        for row in rows:
+            print(f"   {row['smtp_code'] or 'no code':>8}  x{row['count']:<7} {(row['example'] or '')[:80]}")
+    elif args.command == "slowest":
+        print(f"🐢 Slowest sends in run #{run_id}:")
+        for row in slowest_sends(conn, run_id, args.limit):
+            code = f" ({row['smtp_code']})" if row['smtp_code'] else ""
+            print(f"   {row['elapsed']:8.3f}s  {row['email']}  {row['status']}{code}")
+    elif args.command == "failed-emails":
+        for email in failed_emails(conn, run_id):
+            print(email)
+    elif args.command == "lookup":
+        rows = lookup_email(conn, args.email)
+        print(f"🔎 {len(rows)} send(s) to {args.email}")
+        for row in rows:
+            print(f"   run #{row['run_id']} {_when(row['sent_at'])}  {row['status']}  {row['variant'] or ''}"
+                  f"  {row['smtp_code'] or ''} {(row['error'] or '')[:60]}")
+    else:
+        for path in args.journals:
+            imported = import_journal(conn, path)
+            count = conn.execute("SELECT COUNT(*) FROM results WHERE run_id = ?", (imported,)).fetchone()[0]
+            print(f"✅ Imported {count} results from {path} as run #{imported}")
+
+
+if __name__ == "__main__":
+    main()
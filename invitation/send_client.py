@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Thin client for send_daemon.py.
+
+Only the standard library is imported, so a send costs one local HTTP
+request instead of a full send_invitations.py startup. The request goes to
+the daemon's Unix socket, or with --url to its 127.0.0.1 listener, using
+the token the daemon wrote to --token-file:
+
+    python send_client.py someone@example.com "Their Name"
+    python send_client.py --excel recipients.xlsx
+    python send_client.py --json recipients.json      # [{"email": ..., "name": ...}, ...]
+    python send_client.py --status
+"""
+
+import time
+
+started = time.monotonic()
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+import urllib.parse
+
+# Same defaults as send_daemon.py, which is not imported to keep startup fast
+DEFAULT_SOCKET = "send_daemon.sock"
+DEFAULT_TOKEN_FILE = "send_daemon.token"
+DEFAULT_URL = "http://127.0.0.1:8025"
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection to a Unix socket path instead of a host and port."""
+
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def connect(socket_path=DEFAULT_SOCKET, url=None, timeout=None):
+    """A connection to the daemon: its Unix socket, or `url` when given or Unix sockets are unavailable."""
+    if url is None and hasattr(socket, 'AF_UNIX'):
+        return UnixHTTPConnection(socket_path, timeout=timeout)
+    parts = urllib.parse.urlsplit(url or DEFAULT_URL)
+    return http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+
+
+def read_token(token_file):
+    with open(token_file, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+
+def request(conn, path, payload=None, token=None):
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f"Bearer {token}"
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    conn.request('POST' if data is not None else 'GET', path, body=data, headers=headers)
+    response = conn.getresponse()
+    body = json.loads(response.read() or b'{}')
+    if response.status != 200:
+        return {'error': body.get('error', f"HTTP {response.status} {response.reason}")}
+    return body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send invitations through a running send_daemon.py")
+    parser.add_argument("email", nargs="?")
+    parser.add_argument("name", nargs="?", default="Volunteer")
+    parser.add_argument("--excel", help="Excel file to send to (read by the daemon)")
+    parser.add_argument("--json", help="JSON file with a list of {email, name} recipients")
+    parser.add_argument("--status", action="store_true", help="Show daemon status")
+    parser.add_argument("--reload", action="store_true", help="Reload campaign, logos and invitation template")
+    parser.add_argument("--socket", default=os.getenv('SEND_DAEMON_SOCKET', DEFAULT_SOCKET),
+                        help="Unix socket the daemon listens on")
+    parser.add_argument("--url", default=os.getenv('SEND_DAEMON_URL'),
+                        help=f"Daemon started with --port, e.g. {DEFAULT_URL}")
+    parser.add_argument("--token-file", default=os.getenv('SEND_DAEMON_TOKEN_FILE', DEFAULT_TOKEN_FILE),
+                        help="Token written by a daemon started with --port")
+    args = parser.parse_args()
+
+    if args.status:
+        path, payload = '/status', None
+    elif args.reload:
+        path, payload = '/reload', {}
+    elif args.excel:
+        path, payload = '/send', {'excel_file': os.path.abspath(args.excel)}
+    elif args.json:
+        with open(args.json, 'r', encoding='utf-8') as f:
+            path, payload = '/send', {'recipients': json.load(f)}
+    elif args.email:
+        path, payload = '/send', {'recipients': [{'email': args.email, 'name': args.name}]}
+    else:
+        parser.error("give an email address, --excel, --json, --status or --reload")
+
+    conn = connect(args.socket, args.url)
+    address = args.socket if isinstance(conn, UnixHTTPConnection) else f"http://{conn.host}:{conn.port}"
+    token = None
+    if not isinstance(conn, UnixHTTPConnection):
+        try:
+            token = read_token(args.token_file)
+        except OSError as e:
+            print(f"❌ Cannot read the daemon's token from {args.token_file}: {e.strerror}")
+            print("   Run the client from the daemon's directory or pass --token-file")
+            sys.exit(1)
+    try:
+        result = request(conn, path, payload, token)
+    except OSError as e:
+        print(f"❌ Send daemon not reachable at {address}: {e.strerror or e}")
+        print("   Start it with: python send_daemon.py")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    if 'error' in result:
+        print(f"❌ {result['error']}")
+        sys.exit(1)
+    if path != '/send':
+        for key, value in result.items():
+            print(f"   {key}: {value}")
+        return
+
+    print(f"📊 Run #{result['run_id']}: ✅ {result['sent']} sent, ❌ {result['failed']} failed"
+          + (f", 🚫 {result['suppressed']} suppressed" if result['suppressed'] else ""))
+    for failure in result['failures']:
+        code = f" ({failure['smtp_code']})" if failure.get('smtp_code') else ""
+        print(f"   ❌ {failure['email']}{code}: {failure['error']}")
+    if result['time_to_first_message'] is not None:
+        print(f"⏱️  First message accepted {result['time_to_first_message']:.3f}s after the request; "
+              f"done in {result['elapsed']:.3f}s ({time.monotonic() - started:.3f}s including client startup)")
+    sys.exit(1 if result['failed'] else 0)
+
+
+if __name__ == "__main__":
+    main()
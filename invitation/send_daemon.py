@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Warm-start send daemon.
+
+For a small send, most of a send_invitations.py run is startup: importing
+PIL and openpyxl, loading the logos, compiling the campaign, parsing the DKIM
+key and the SMTP handshake (TCP, STARTTLS, AUTH). The daemon does all of that
+once and then takes send requests over local HTTP, keeping logged-in SMTP
+connections open between requests (NOOP every --keepalive seconds) and the
+rate the AIMD controller has learned for the relay:
+
+    python send_daemon.py
+    python send_client.py someone@example.com "Their Name"
+    python send_client.py --excel recipients.xlsx
+
+A request sends mail from the operator's account and can name any workbook
+the daemon can read, so only the operator may make one. By default the
+daemon listens on a Unix socket (send_daemon.sock) created with mode 0600.
+Where Unix sockets are unavailable, or with --port, it listens on
+127.0.0.1 instead and every request must carry the token it writes to a
+0600 file (send_daemon.token) and a Host header naming that address, so
+neither a web page in the operator's browser nor another local user can
+use it. POST bodies must be sent as application/json, which a cross-origin
+page cannot do without a CORS preflight the daemon never answers.
+
+Endpoints (JSON):
+    POST /send     {"recipients": [{"email": ..., "name": ...}]} or {"excel_file": path}
+    POST /reload   reload the campaign, logos and invitation template
+    GET  /status   uptime, totals, idle connections and rate control state
+
+Every request is recorded as a run in the run log (run_log.py). Responses
+report the time to first message: from the request arriving to the first
+message accepted by the relay.
+"""
+
+import argparse
+import hmac
+import json
+import os
+import secrets
+import smtplib
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from adaptive_control import AIMDController
+from bounce_processor import load_suppression_set
+from campaign import load_campaign
+from run_log import DEFAULT_RUN_LOG, RunRecorder, open_run_log, start_run
+from send_invitations import (MAX_SEND_ATTEMPTS, get_invite_template, get_smtp_config,
+                              load_logos_for_email, read_recipients_from_excel, send_adaptively,
+                              send_single_email)
+from smtp_pool import SMTPPool
+
+DEFAULT_SOCKET = "send_daemon.sock"
+DEFAULT_TOKEN_FILE = "send_daemon.token"
+DEFAULT_PORT = 8025  # Only used with --port or where Unix sockets are unavailable
+MAX_REFUSED_BODY = 1024 * 1024  # Bodies of refused requests read before replying
+KEEPALIVE_INTERVAL = 60  # Relays commonly drop sessions idle for a few minutes
+
+
+class SendDaemon:
+    """Campaign, assets and SMTP connections kept warm across send requests."""
+
+    def __init__(self, smtp_config, campaign_path=None, keepalive=KEEPALIVE_INTERVAL):
+        self.smtp_config = smtp_config
+        self.campaign_path = campaign_path
+        self.keepalive_interval = keepalive
+        self.controller = AIMDController.from_env()
+        self.pool = SMTPPool(smtp_config, size=self.controller.max_concurrency)
+        self.run_log = open_run_log()
+        self.started = time.time()
+        self.totals = {'requests': 0, 'success': 0, 'failed': 0}
+        self._send_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.reload()
+
+    def reload(self):
+        """(Re)load everything a send needs before its first message."""
+        with self._send_lock:
+            self.campaign = load_campaign(self.campaign_path)
+            self.logos = load_logos_for_email()
+            self.invite_template = get_invite_template()
+        return {'campaign': self.campaign['name'], 'logos': sorted(self.logos),
+                'invite_template': self.invite_template}
+
+    def start(self):
+        """Log in to the relay and start the keepalive thread."""
+        opened = self.pool.warm()
+        threading.Thread(target=self._keepalive_loop, daemon=True).start()
+        return opened
+
+    def _keepalive_loop(self):
+        while not self._stop.wait(self.keepalive_interval):
+            # Skip the round while a send is using the connections
+            if not self._send_lock.acquire(blocking=False):
+                continue
+            try:
+                self.pool.keepalive()
+                self.pool.warm(self.controller.concurrency)
+            except Exception as e:
+                print(f"⚠️  Keepalive failed: {e}")
+            finally:
+                self._send_lock.release()
+
+    def send(self, recipients, source="daemon"):
+        """Send to a list of recipient dicts and return a JSON-ready summary."""
+        with self._send_lock:
+            started = time.monotonic()
+            suppressed = load_suppression_set()
+            allowed = [r for r in recipients if r['email'].lower() not in suppressed]
+            total = len(allowed)
+            run_id = start_run(self.run_log, source=source, campaign=self.campaign['name'],
+                               mode="daemon", total=total)
+            recorder = RunRecorder(self.run_log, run_id)
+            counts = {'success': 0, 'failed': 0}
+            failures = []
+            first_message = None
+
+            def send_one(idx, recipient, attempt):
+                return send_single_email(recipient, self.smtp_config, self.logos, idx, total,
+                                         self.invite_template, pool=self.pool, campaign=self.campaign,
+                                         retries_left=MAX_SEND_ATTEMPTS - 1 - attempt)
+
+            def on_result(result, attempts):
+                nonlocal first_message
+                recorder.record(result, attempts=attempts)
+                counts[result['status']] += 1
+                if result['status'] == 'success':
+                    if first_message is None:
+                        first_message = time.monotonic() - started
+                else:
+                    failures.append({'email': result['email'], 'error': result.get('error'),
+                                     'smtp_code': result.get('smtp_code')})
+
+            try:
+                send_adaptively(allowed, send_one, self.controller, on_result)
+            finally:
+                recorder.close()
+
+            self.totals['requests'] += 1
+            self.totals['success'] += counts['success']
+            self.totals['failed'] += counts['failed']
+            return {'run_id': run_id, 'sent': counts['success'], 'failed': counts['failed'],
+                    'suppressed': len(recipients) - total, 'failures': failures,
+                    'time_to_first_message': first_message, 'elapsed': time.monotonic() - started}
+
+    def status(self):
+        return {'uptime': time.time() - self.started, 'campaign': self.campaign['name'],
+                'idle_connections': self.pool.idle_count(), 'rate_control': self.controller.state(),
+                **self.totals}
+
+    def close(self):
+        self._stop.set()
+        self.pool.close()
+        self.run_log.close()
+
+
+def parse_recipients(payload):
+    """Recipient dicts from a /send request body; raises ValueError if malformed."""
+    if payload.get('excel_file'):
+        # Unfiltered: SendDaemon.send() applies the suppression list and
+        # reports how many rows it skipped
+        recipients = read_recipients_from_excel(payload['excel_file'], suppressed=frozenset())
+        if recipients is None:
+            raise ValueError(f"Could not read {payload['excel_file']}")
+        return recipients, payload['excel_file']
+
+    recipients = []
+    for entry in payload.get('recipients') or []:
+        if not isinstance(entry, dict) or not str(entry.get('email') or '').strip():
+            raise ValueError(f"Recipient without an email: {entry!r}")
+        recipients.append({'email': str(entry['email']).strip(),
+                           'name': str(entry.get('name') or 'Volunteer').strip()})
+    if not recipients:
+        raise ValueError("No recipients given")
+    return recipients, "daemon request"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def _reply(self, code, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _refuse(self):
+        """Reply with an error and return True unless the request may be served."""
+        error = self._access_error()
+        if error is None:
+            return False
+        # Read what the client already sent, so it gets the reply rather
+        # than a broken pipe; anything larger just has its connection closed
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = 0
+        if 0 < length <= MAX_REFUSED_BODY:
+            self.rfile.read(length)
+        self.close_connection = True
+        self._reply(*error)
+        return True
+
+    def _access_error(self):
+        token = self.server.token
+        if token is not None:
+            if self.headers.get('Host') not in self.server.allowed_hosts:
+                return 403, {'error': "Unexpected Host header"}
+            supplied = self.headers.get('Authorization', '')
+            if not hmac.compare_digest(supplied.encode('utf-8'), f"Bearer {token}".encode('utf-8')):
+                return 401, {'error': "Missing or wrong token"}
+        if self.command == 'POST':
+            content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+            if content_type != 'application/json':
+                return 415, {'error': "Requests must be sent as application/json"}
+        return None
+
+    def do_GET(self):
+        if self._refuse():
+            return
+        if self.path == '/status':
+            self._reply(200, self.server.send_daemon.status())
+        else:
+            self._reply(404, {'error': f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        if self._refuse():
+            return
+        daemon = self.server.send_daemon
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            if self.path == '/send':
+                recipients, source = parse_recipients(payload)
+                result = daemon.send(recipients, source)
+                first = result['time_to_first_message']
+                print(f"📨 Run #{result['run_id']}: ✅ {result['sent']} ❌ {result['failed']}"
+                      f" (first message {f'{first:.3f}s' if first is not None else '-'},"
+                      f" total {result['elapsed']:.3f}s)")
+                self._reply(200, result)
+            elif self.path == '/reload':
+                self._reply(200, daemon.reload())
+            else:
+                self._reply(404, {'error': f"Unknown endpoint {self.path}"})
+        except ValueError as e:
+            self._reply(400, {'error': str(e)})
+        except Exception as e:
+            self._reply(500, {'error': str(e)})
+
+    def log_message(self, format, *args):
+        pass  # Requests are summarised in do_POST instead
+
+
+if hasattr(socket, 'AF_UNIX'):
+    class _UnixHTTPServer(ThreadingHTTPServer):
+        address_family = socket.AF_UNIX
+
+        def server_bind(self):
+            # Owner-only from the moment the socket file exists; HTTPServer's
+            # own server_bind expects a (host, port) address
+            umask = os.umask(0o177)
+            try:
+                socketserver.TCPServer.server_bind(self)
+            finally:
+                os.umask(umask)
+            self.server_name, self.server_port = 'localhost', 0
+
+
+def remove_stale_socket(path):
+    """Remove a socket file left by a daemon that is no longer running."""
+    if not os.path.exists(path):
+        return
+    if not stat.S_ISSOCK(os.stat(path).st_mode):
+        raise RuntimeError(f"{path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise RuntimeError(f"A send daemon is already listening on {path}")
+    finally:
+        probe.close()
+
+
+def write_token_file(path):
+    """Write a fresh access token to `path`, readable by the owner only."""
+    if os.path.exists(path):
+        os.unlink(path)
+    token = secrets.token_urlsafe(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token + "\n")
+    return token
+
+
+def make_server(socket_path=DEFAULT_SOCKET, port=None, token_file=DEFAULT_TOKEN_FILE):
+    """
+    The HTTP server for the daemon: on a 0600 Unix socket, or on
+    127.0.0.1:port with a token when a port is given or Unix sockets are
+    unavailable. Returns (server, address, path to remove on shutdown).
+    """
+    if port is None and hasattr(socket, 'AF_UNIX'):
+        remove_stale_socket(socket_path)
+        server = _UnixHTTPServer(socket_path, _Handler)
+        server.token = None
+        return server, socket_path, socket_path
+
+    server = ThreadingHTTPServer(('127.0.0.1', DEFAULT_PORT if port is None else port), _Handler)
+    bound = server.server_address[1]
+    server.allowed_hosts = {f"127.0.0.1:{bound}", f"localhost:{bound}"}
+    server.token = write_token_file(token_file)
+    return server, f"http://127.0.0.1:{bound}, token in {token_file}", token_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the send path warm and accept send requests locally")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket to listen on (created 0600)")
+    parser.add_argument("--port", type=int,
+                        help=f"Listen on 127.0.0.1:PORT with a token instead of the Unix socket "
+                             f"(the default, on {DEFAULT_PORT}, where Unix sockets are unavailable)")
+    parser.add_argument("--token-file", default=DEFAULT_TOKEN_FILE,
+                        help="Where the 127.0.0.1 listener writes its access token (0600)")
+    parser.add_argument("--campaign", help="Campaign definition with template variants (JSON)")
+    parser.add_argument("--keepalive", type=float, default=KEEPALIVE_INTERVAL,
+                        help="Seconds between NOOPs on idle SMTP connections")
+    args = parser.parse_args()
+
+    smtp_config = get_smtp_config()
+    daemon = SendDaemon(smtp_config, args.campaign, args.keepalive)
+    print(f"🧪 Campaign '{daemon.campaign['name']}', logos: {', '.join(daemon.logos) or 'none'}"
+          f"{', invitation template: ' + daemon.invite_template if daemon.invite_template else ''}")
+    try:
+        opened = daemon.start()
+    except smtplib.SMTPAuthenticationError:
+        print("\n❌ Authentication failed! Please check your email and password.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ Error connecting to SMTP server: {str(e)}")
+        sys.exit(1)
+    print(f"🔌 {opened} connection(s) open to {smtp_config['server']}:{smtp_config['port']}")
+
+    try:
+        server, address, cleanup_path = make_server(args.socket, args.port, args.token_file)
+    except (OSError, RuntimeError) as e:
+        print(f"\n❌ Could not start listening: {e}")
+        daemon.close()
+        sys.exit(1)
+    server.send_daemon = daemon
+    print(f"🔥 Send daemon listening on {address} (runs recorded in {DEFAULT_RUN_LOG}, "
+          f"Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(cleanup_path):
+            os.unlink(cleanup_path)
+        daemon.close()
+        print(f"\n📊 Served {daemon.totals['requests']} requests: ✅ {daemon.totals['success']} sent, "
+              f"❌ {daemon.totals['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
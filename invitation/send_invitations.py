@@ -7,39 +7,66 @@ Reads recipient details from Excel and sends HTML-formatted invitations via SMTP
 import smtplib
 import os
 import sys
+import argparse
+import json
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from email.mime.image import MIMEImage
+from email.mime.base import MIMEBase
 from pathlib import Path
+from collections import Counter
+from itertools import count, islice
 from datetime import datetime
 from openpyxl import load_workbook
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+import heapq
 import threading
 import time
 from PIL import Image, ImageDraw, ImageFont
 import shutil
 
+from adaptive_control import AIMDController
+from asset_cache import cache_key, encode_mime_base64, file_digest, get_default_cache
+from bounce_processor import load_suppression_set
+from build_assets import LOGO_SOURCES, load_asset_manifest
+from campaign import load_campaign, pick_variant, render_variant
+from dkim_signing import load_dkim_signer
+from progress import ProgressView
+from run_log import DEFAULT_RUN_LOG, RunRecorder, open_run_log, start_run
+from smtp_pool import SMTPPool, classify_smtp_error, connect_smtp
+from stream_message import deliver_streamed
+from xlsx_stream import iter_xlsx_rows
+from image_output import FORMATS, encode_image, get_image_output_settings, settings_id
+
 # Load environment variables from .env file if it exists
 load_dotenv()
 
 SCRIPT_DIR = Path(__file__).resolve().parent
+MAX_SEND_ATTEMPTS = 3  # Transient (4xx) failures are retried up to this many times
+RETRY_BACKOFF_SECONDS = 10  # First retry waits this long, doubling for each further attempt
+
 
+EMAIL_LOGOS = ('sm_logo',)
 
-def load_logos_for_email():
+
+def load_logos_for_email(cids=EMAIL_LOGOS):
     """
-    Load logo files and return dict of {cid: (bytes, mime_subtype)}.
+    Load logos and return dict of {cid: (base64_payload, mime_subtype)}.
     Logos are attached as inline MIME parts and referenced via cid: in HTML.
+    Pre-built assets (build_assets.py) are used when available; otherwise the
+    source files are read and encoded once here, never per message.
     """
+    logos = load_asset_manifest(cids)
+    if logos is not None:
+        return logos
+
     logos = {}
-    configs = [
-        ('sm_logo', 'sm_logo_small.png', 'png'),
-    ]
-    for cid, filename, subtype in configs:
+    for cid in cids:
+        filename = LOGO_SOURCES[cid][0]
         path = SCRIPT_DIR / filename
         try:
             with open(path, 'rb') as f:
-                logos[cid] = (f.read(), subtype)
+                logos[cid] = (encode_mime_base64(f.read()), 'png')
         except FileNotFoundError:
             pass
     return logos
@@ -197,16 +224,177 @@ def get_html_template(name="Volunteer"):
 </html>
 """
 
-def read_recipients_from_excel(file_path):
-    """Read recipient details from Excel file (Email and optional Name)"""
-    recipients = []
-    
-    try:
+# Card-style invitation (the default template). Uses CSS to mimic the
+# design, no image generation. Colors picked from the original design.
+CARD_TEMPLATE = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>Congratulations</title>
+</head>
+<body style="margin: 0; padding: 0; background-color: #f4f4f4; font-family: 'Arial', sans-serif;">
+
+<table width="100%" cellpadding="0" cellspacing="0" style="background-color: #f4f4f4; padding: 40px 0;">
+    <tr>
+        <td align="center">
+            
+            <!-- Main Card (Restored with Border & Background) -->
+            <div style="
+                max-width: 600px; 
+                margin: 0 auto; 
+                background-color: #420000; /* Card Background */
+                border: 2px solid #ffd700; /* Gold Border */
+                border-radius: 15px;
+                padding: 40px 20px; 
+                box-shadow: 0 10px 25px rgba(0,0,0,0.5);
+                text-align: center;
+                color: #ffffff;
+            ">
+                
+                <!-- Top Gold Decoration Line -->
+                <div style="height: 2px; background: #ffd700; margin-bottom: 30px;"></div>
+
+                <!-- Congratulations Text -->
+                <h1 style="
+                    font-family: 'Times New Roman', Times, serif; 
+                    color: #ffffff; 
+                    font-size: 36px; 
+                    margin: 0 0 10px 0; 
+                    font-style: italic;
+                    font-weight: normal;
+                    text-shadow: 0 2px 4px rgba(0,0,0,0.5);
+                ">
+                    Congratulations
+                </h1>
+
+                <h2 style="
+                    font-family: 'Arial', sans-serif;
+                    color: #ffc107; 
+                    font-size: 20px; 
+                    margin: 0 0 35px 0; 
+                    text-transform: uppercase; 
+                    letter-spacing: 2px;
+                    line-height: 1.4;
+                ">
+                    WELCOME TO OUR<br>
+                    <span style="color: #ffd700; font-size: 24px; font-weight: bold;">SM VOLUNTEERS FORUM</span>
+                </h2>
+
+                <!-- Logo (Fixed Round Shape with Container) -->
+                <div style="margin: 0 auto 25px auto; width: 160px; height: 160px; border-radius: 50%; border: 3px solid #b8860b; overflow: hidden; background-color: transparent;">
+                    <img src="cid:sm_logo" alt="SM Volunteers" style="display: block; width: 100%; height: 100%; object-fit: cover;">
+                </div>
+
+                <!-- Name Display (Transparent with Gold Border) -->
+                <div style="
+                    background-color: transparent;
+                    border: 2px solid #ffd700;
+                    padding: 15px 0;
+                    margin: 30px auto;
+                    width: 80%;
+                    border-radius: 8px;
+                    box-shadow: 0 0 15px rgba(255, 215, 0, 0.1);
+                ">
+                    <span style="
+                        font-family: 'Arial Black', 'Arial Bold', sans-serif;
+                        font-size: 30px;
+                        color: #ffd700; /* Gold Text */
+                        text-transform: uppercase;
+                        letter-spacing: 2px;
+                        display: block;
+                        font-weight: 900;
+                        text-shadow: 0 2px 4px rgba(0,0,0,0.5);
+                    ">
+                        {{NAME_UPPER}}
+                    </span>
+                </div>
+
+                <!-- Main Body Content -->
+                <div style="text-align: left; padding: 0 20px; color: #e0e0e0; font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; font-size: 16px; line-height: 1.6;">
+                    <p>
+                        We are delighted to inform you that you have <strong>successfully cleared the SM interview</strong>. 
+                        Your dedication, confidence, and commitment truly stood out.
+                    </p>
+                    <p>
+                        You are now an <strong>official member of the SM Team</strong> and eligible to participate in all 
+                        <strong>SM events, initiatives, and activities</strong>.
+                    </p>
+                    <p style="margin-top: 25px; font-size: 14px; color: #cccccc;">
+                        All upcoming information, announcements, and updates will be shared 
+                        <strong>only through the official WhatsApp group</strong>. 
+                        Kindly ensure that you join the group to stay informed.
+                    </p>
+                </div>
+
+                <!-- Footer Text -->
+                <p style="
+                    font-family: 'Georgia', serif;
+                    font-size: 15px;
+                    color: #cccccc;
+                    line-height: 1.6;
+                    margin-top: 35px;
+                    font-style: italic;
+                    padding: 0 20px;
+                ">
+                    Achievements are earned through dedication and hard work.<br>
+                    Congratulations on this proud milestone!
+                </p>
+                
+                <!-- WhatsApp Button (Solid Green) -->
+                <div style="margin-top: 40px; margin-bottom: 10px;">
+                    <a href="https://chat.whatsapp.com/CJeFwL5abHc8VkqeAa3n1v" style="
+                        background-color: #25D366; /* Solid Green */
+                        color: white;
+                        padding: 12px 30px;
+                        text-decoration: none;
+                        border-radius: 25px;
+                        font-family: sans-serif;
+                        font-weight: bold;
+                        box-shadow: 0 4px 10px rgba(37, 211, 102, 0.3);
+                        display: inline-block;
+                    ">
+                        Join WhatsApp Group
+                    </a>
+                </div>
+
+            </div>
+            
+            <p style="color: #666666; font-size: 11px; margin-top: 20px; font-family: sans-serif;">
+                KSRCT SM Volunteers
+            </p>
+
+        </td>
+    </tr>
+</table>
+</body>
+</html>
+    """
+
+
+def iter_recipients_from_excel(file_path, suppressed=None, low_memory=False):
+    """
+    Yield recipient dicts from the Excel file one row at a time (Email and
+    optional Name).
+    Addresses in the bounce suppression index (bounce_processor.py) are skipped;
+    pass `suppressed` to use a different set. With `low_memory`, rows come from
+    xlsx_stream.py, whose memory use does not grow with the sheet.
+    """
+    if suppressed is None:
+        suppressed = load_suppression_set()
+    skipped = 0
+
+    if low_memory:
+        rows = iter_xlsx_rows(file_path)
+        close = rows.close
+    else:
         workbook = load_workbook(filename=file_path, read_only=True)
-        sheet = workbook.active
-        
+        rows = workbook.active.iter_rows(values_only=True)
+        close = workbook.close
+    try:
         # Get headers
-        header_row = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True))
+        header_row = next(rows, ())
         email_idx = 0
         name_idx = -1
         
@@ -220,18 +408,39 @@ def read_recipients_from_excel(file_path):
                     name_idx = i
         
         # Skip header row and read data
-        for row in sheet.iter_rows(min_row=2, values_only=True):
+        for row in rows:
             if len(row) > email_idx and row[email_idx]:
                 email = str(row[email_idx]).strip()
                 name = "Volunteer"
                 if name_idx != -1 and len(row) > name_idx and row[name_idx]:
                     name = str(row[name_idx]).strip()
                 
-                if email:
-                    recipients.append({'email': email, 'name': name})
-        
-        workbook.close()
-        return recipients
+                if email and email.lower() in suppressed:
+                    skipped += 1
+                elif email:
+                    yield {'email': email, 'name': name}
+    finally:
+        close()
+    if skipped:
+        print(f"🚫 Skipped {skipped} suppressed (bounced) addresses")
+
+
+def count_recipients_in_excel(file_path, suppressed=None):
+    """
+    Number of recipients iter_recipients_from_excel() yields in low-memory
+    mode (blank and suppressed rows excluded), streaming the sheet once.
+    """
+    return sum(1 for _ in iter_recipients_from_excel(file_path, suppressed, low_memory=True))
+
+
+def read_recipients_from_excel(file_path, suppressed=None):
+    """
+    Read recipient details from Excel file (Email and optional Name).
+    Addresses in the bounce suppression index (bounce_processor.py) are skipped;
+    pass `suppressed` to use a different set.
+    """
+    try:
+        return list(iter_recipients_from_excel(file_path, suppressed))
     
     except FileNotFoundError:
         print(f"❌ Error: Excel file not found at {file_path}")
@@ -246,13 +455,17 @@ def get_smtp_config():
     config = {}
     
     # Try to get from environment variables first
-    config['server'] = "smtp.gmail.com"
-    config['port'] = "587"
-    config['email'] = "smvolunteers@ksrct.ac.in"  # Change to your Gmail address
-    config['password'] = "mxod vqth nulr ywoh"  # gmail app password
+    config['server'] = os.getenv('SMTP_SERVER', "smtp.gmail.com")
+    config['port'] = os.getenv('SMTP_PORT', "587")
+    config['email'] = os.getenv('SMTP_EMAIL', "smvolunteers@ksrct.ac.in")  # Change to your Gmail address
+    config['password'] = os.getenv('SMTP_PASSWORD', "mxod vqth nulr ywoh")  # gmail app password
+    config['starttls'] = os.getenv('SMTP_STARTTLS', '1') not in ('0', 'false', 'no')
     
+    # An explicitly empty SMTP_PASSWORD means the relay needs no login
+    needs_password = not config['password'] and 'SMTP_PASSWORD' not in os.environ
+
     # If not in environment, prompt user
-    if not all([config['server'], config['port'], config['email'], config['password']]):
+    if not all([config['server'], config['port'], config['email']]) or needs_password:
         print("\n📧 SMTP Configuration")
         print("=" * 50)
         
@@ -268,129 +481,155 @@ def get_smtp_config():
         if not config['email']:
             config['email'] = input("Enter your email address: ").strip()
         
-        if not config['password']:
+        if needs_password:
             import getpass
             config['password'] = getpass.getpass("Enter your email password/app password: ")
     
     config['port'] = int(config['port'])
+    # DKIM key is parsed once here and shared by every send
+    config['dkim'] = load_dkim_signer(config['email'])
     return config
 
 
+INVITE_RENDER_VERSION = 1  # Bump when the drawing code changes to invalidate cached images
+
+
+def find_invitation_font():
+    """Pick the serif font used for names on the invitation image."""
+    # Load Font - Switch to Serif (Times New Roman) for premium look
+    font_names = ["timesbd.ttf", "georgiab.ttf", "arialbd.ttf"]
+    for fn in font_names:
+        possible_path = f"C:/Windows/Fonts/{fn}"
+        if os.path.exists(possible_path):
+            return possible_path
+    return "C:/Windows/Fonts/arial.ttf"
+
+
+def render_invitation_image(name, template_path, font_path):
+    """Draw the recipient's name on the template. Returns a PIL image."""
+    img = Image.open(template_path)
+    draw = ImageDraw.Draw(img)
+    width, height = img.size
+
+    # --- PATCHING LOGIC TO REMOVE "NAME" ---
+    # Strategy: Tile a clean section of the ribbon to cover the center area.
+    # This prevents the blurry look of stretching.
+    
+    y_ribbon_start = int(height * 0.69)
+    y_ribbon_end = int(height * 0.77)
+    ribbon_height = y_ribbon_end - y_ribbon_start
+    
+    # Target area to cover (Center where "NAME" is)
+    target_x_start = int(width * 0.38) # Narrowed slightly to be safe
+    target_x_end = int(width * 0.62)
+    
+    # Source area (Clean ribbon on left)
+    src_x_start = int(width * 0.20)
+    src_x_end = int(width * 0.28) # Take a smaller, safer clean chunk
+    src_width = src_x_end - src_x_start
+    
+    clean_slice = img.crop((src_x_start, y_ribbon_start, src_x_end, y_ribbon_end))
+    
+    # Tile the slice to cover the target width
+    current_x = target_x_start
+    while current_x < target_x_end:
+        paste_width = min(src_width, target_x_end - current_x)
+        if paste_width < src_width:
+            # Crop the last piece if needed
+            patch = clean_slice.crop((0, 0, paste_width, ribbon_height))
+        else:
+            patch = clean_slice
+        
+        img.paste(patch, (current_x, y_ribbon_start))
+        current_x += src_width
+    
+    # --- DRAWING TEXT ---
+    
+    name = name.upper() # FORCE UPPERCASE
+    
+    # Color: Dark Maroon
+    text_color = (60, 0, 0) 
+    
+    # Max width for text 
+    max_text_width = int(width * 0.55) 
+    
+    # Dynamic Scaler
+    current_font_size = int(width * 0.06) # Start bigger
+    min_font_size = int(width * 0.03)
+
+    while current_font_size > min_font_size:
+        try:
+            font = ImageFont.truetype(font_path, current_font_size)
+        except OSError:
+            font = ImageFont.load_default()
+            break
+
+        if hasattr(draw, "textbbox"):
+            bbox = draw.textbbox((0, 0), name, font=font)
+            text_w = bbox[2] - bbox[0]
+            text_h = bbox[3] - bbox[1]
+        else:
+            text_w, text_h = draw.textsize(name, font=font)
+            
+        if text_w <= max_text_width:
+            break 
+        
+        current_font_size -= 2
+
+    if hasattr(draw, "textbbox"):
+        bbox = draw.textbbox((0, 0), name, font=font)
+        text_w, text_h = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    
+    # Calculate centered position
+    x = (width - text_w) / 2
+    
+    # Center vertically in the ribbon patch
+    ribbon_middle = y_ribbon_start + (ribbon_height / 2)
+    # Adjust vertical center slightly for font baseline
+    y = ribbon_middle - (text_h / 2) - (text_h * 0.15) 
+
+    # Draw text
+    draw.text((x, y), name, font=font, fill=text_color)
+    return img
+
+
+def get_invitation_asset(name, template_path="Congratulations.png", output_dir="generated_invites"):
+    """
+    Return a cached personalized invitation as (key, file_path, base64_payload, mime_subtype).
+
+    Assets are content-addressed on template, font, output settings and name,
+    so repeated campaigns and retries skip rendering and base64 encoding, and
+    two recipients whose names sanitise the same way can never collide.
+    """
+    settings = get_image_output_settings()
+    font_path = find_invitation_font()
+    font_id = file_digest(font_path) if os.path.exists(font_path) else font_path
+    key = cache_key(INVITE_RENDER_VERSION, file_digest(template_path), font_id,
+                    settings_id(settings), name)
+    subtype = FORMATS[settings['format']][1]
+
+    cache = get_default_cache(output_dir)
+    cached = cache.get(key)
+    if cached:
+        return (key,) + cached + (subtype,)
+
+    img = render_invitation_image(name, template_path, font_path)
+    data, subtype, ext = encode_image(img, settings)
+    return (key,) + cache.put(key, ext, data) + (subtype,)
+
+
 def generate_invitation_image(name, template_path="Congratulations.png", output_dir="generated_invites"):
     """
     Generate a personalized image with the recipient's name drawn on the template.
     Returns the path to the generated image file.
     """
     try:
-        # Create output directory if it doesn't exist
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Sanitize filename
-        safe_name = "".join([c for c in name if c.isalnum() or c in (' ', '_', '-')]).strip()
-        if not safe_name:
-            safe_name = "Guest"
-        output_filename = f"Invitation_{safe_name}.png"
-        output_path = os.path.join(output_dir, output_filename)
-        
         # Check if template exists
         if not os.path.exists(template_path):
             print(f"⚠️ Template '{template_path}' not found! Skipping image generation.")
             return None
-            
-        img = Image.open(template_path)
-        draw = ImageDraw.Draw(img)
-        width, height = img.size
 
-        # --- PATCHING LOGIC TO REMOVE "NAME" ---
-        # Strategy: Tile a clean section of the ribbon to cover the center area.
-        # This prevents the blurry look of stretching.
-        
-        y_ribbon_start = int(height * 0.69)
-        y_ribbon_end = int(height * 0.77)
-        ribbon_height = y_ribbon_end - y_ribbon_start
-        
-        # Target area to cover (Center where "NAME" is)
-        target_x_start = int(width * 0.38) # Narrowed slightly to be safe
-        target_x_end = int(width * 0.62)
-        target_width = target_x_end - target_x_start
-        
-        # Source area (Clean ribbon on left)
-        src_x_start = int(width * 0.20)
-        src_x_end = int(width * 0.28) # Take a smaller, safer clean chunk
-        src_width = src_x_end - src_x_start
-        
-        clean_slice = img.crop((src_x_start, y_ribbon_start, src_x_end, y_ribbon_end))
-        
-        # Tile the slice to cover the target width
-        current_x = target_x_start
-        while current_x < target_x_end:
-            paste_width = min(src_width, target_x_end - current_x)
-            if paste_width < src_width:
-                # Crop the last piece if needed
-                patch = clean_slice.crop((0, 0, paste_width, ribbon_height))
-            else:
-                patch = clean_slice
-            
-            img.paste(patch, (current_x, y_ribbon_start))
-            current_x += src_width
-        
-        # --- DRAWING TEXT ---
-        
-        name = name.upper() # FORCE UPPERCASE
-        
-        # Color: Dark Maroon
-        text_color = (60, 0, 0) 
-        
-        # Max width for text 
-        max_text_width = int(width * 0.55) 
-        
-        # Dynamic Scaler
-        current_font_size = int(width * 0.06) # Start bigger
-        min_font_size = int(width * 0.03)
-        
-        # Load Font - Switch to Serif (Times New Roman) for premium look
-        font_names = ["timesbd.ttf", "georgiab.ttf", "arialbd.ttf"]
-        font_path = None
-        for fn in font_names:
-            possible_path = f"C:/Windows/Fonts/{fn}"
-            if os.path.exists(possible_path):
-                font_path = possible_path
-                break
-        
-        if not font_path:
-             font_path = "C:/Windows/Fonts/arial.ttf"
-
-        while current_font_size > min_font_size:
-            try:
-                font = ImageFont.truetype(font_path, current_font_size)
-            except OSError:
-                font = ImageFont.load_default()
-                break
-
-            if hasattr(draw, "textbbox"):
-                bbox = draw.textbbox((0, 0), name, font=font)
-                text_w = bbox[2] - bbox[0]
-                text_h = bbox[3] - bbox[1]
-            else:
-                text_w, text_h = draw.textsize(name, font=font)
-                
-            if text_w <= max_text_width:
-                break 
-            
-            current_font_size -= 2
-        
-        # Calculate centered position
-        x = (width - text_w) / 2
-        
-        # Center vertically in the ribbon patch
-        ribbon_middle = y_ribbon_start + (ribbon_height / 2)
-        # Adjust vertical center slightly for font baseline
-        y = ribbon_middle - (text_h / 2) - (text_h * 0.15) 
-
-        # Draw text
-        draw.text((x, y), name, font=font, fill=text_color)
-
-        img.save(output_path)
+        _, output_path, _, _ = get_invitation_asset(name, template_path, output_dir)
         return output_path
 
     except Exception as e:
@@ -398,214 +637,230 @@ def generate_invitation_image(name, template_path="Congratulations.png", output_
         return None
 
 
-def send_single_email(recipient, smtp_config, logos, idx, total):
-    """Send a single email to one recipient (thread-safe)."""
+def get_invite_template():
+    """Invitation image template to attach (INVITE_TEMPLATE), or None if absent."""
+    template_path = os.getenv('INVITE_TEMPLATE', 'Congratulations.png')
+    return template_path if os.path.exists(template_path) else None
+
+
+def make_image_part(encoded, subtype, filename, cid=None):
+    """Build an image MIME part from an already base64-encoded payload."""
+    part = MIMEBase('image', subtype)
+    part.set_payload(encoded)
+    part['Content-Transfer-Encoding'] = 'base64'
+    if cid:
+        part.add_header('Content-Disposition', 'inline', filename=filename)
+        part.add_header('Content-ID', f'<{cid}>')
+    else:
+        part.add_header('Content-Disposition', 'attachment', filename=filename)
+    return part
+
+
+_default_campaign = None
+
+
+def get_default_campaign():
+    """Campaign from CAMPAIGN_FILE (or the built-in card), compiled once per process."""
+    global _default_campaign
+    if _default_campaign is None:
+        _default_campaign = load_campaign()
+    return _default_campaign
+
+
+def build_invitation_message(recipient, smtp_config, logos, invite_template=None, variant=None):
+    """
+    Build the invitation email for one recipient from a compiled campaign
+    variant (default: the card template).
+    Returns (message, attachment_key) where attachment_key identifies the
+    cached invitation image, if one was attached.
+    """
     email = recipient['email']
-    name = recipient['name'] 
+    name = recipient['name']
+    variant = variant or pick_variant(get_default_campaign(), email)
+    subject, text_content, html_content = render_variant(variant, recipient)
+
+    # Determine logos to attach
+    # We need 'sm_logo' for the HTML cid:sm_logo
     
-    try:
-        # Create new connection for this thread
-        server = smtplib.SMTP(smtp_config['server'], smtp_config['port'], timeout=90)
-        server.starttls()
-        server.login(smtp_config['email'], smtp_config['password'])
-        
-        # Prepare HTML Content using CSS to mimic the design (No image generation)
-        # Colors picked from the original design
-        
-        html_content = f"""
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Congratulations</title>
-</head>
-<body style="margin: 0; padding: 0; background-color: #f4f4f4; font-family: 'Arial', sans-serif;">
+    msg = MIMEMultipart('related')
+    msg['Subject'] = subject
+    msg['From'] = f"SM Official <{smtp_config['email']}>"
+    msg['To'] = email
+
+    # Plain-text and HTML alternatives; filters penalise HTML-only mail
+    body = MIMEMultipart('alternative')
+    body.attach(MIMEText(text_content, 'plain', 'utf-8'))
+    body.attach(MIMEText(html_content, 'html', 'utf-8'))
+    msg.attach(body)
     
-    <table width="100%" cellpadding="0" cellspacing="0" style="background-color: #f4f4f4; padding: 40px 0;">
-        <tr>
-            <td align="center">
-                
-                <!-- Main Card (Restored with Border & Background) -->
-                <div style="
-                    max-width: 600px; 
-                    margin: 0 auto; 
-                    background-color: #420000; /* Card Background */
-                    border: 2px solid #ffd700; /* Gold Border */
-                    border-radius: 15px;
-                    padding: 40px 20px; 
-                    box-shadow: 0 10px 25px rgba(0,0,0,0.5);
-                    text-align: center;
-                    color: #ffffff;
-                ">
-                    
-                    <!-- Top Gold Decoration Line -->
-                    <div style="height: 2px; background: #ffd700; margin-bottom: 30px;"></div>
-
-                    <!-- Congratulations Text -->
-                    <h1 style="
-                        font-family: 'Times New Roman', Times, serif; 
-                        color: #ffffff; 
-                        font-size: 36px; 
-                        margin: 0 0 10px 0; 
-                        font-style: italic;
-                        font-weight: normal;
-                        text-shadow: 0 2px 4px rgba(0,0,0,0.5);
-                    ">
-                        Congratulations
-                    </h1>
-
-                    <h2 style="
-                        font-family: 'Arial', sans-serif;
-                        color: #ffc107; 
-                        font-size: 20px; 
-                        margin: 0 0 35px 0; 
-                        text-transform: uppercase; 
-                        letter-spacing: 2px;
-                        line-height: 1.4;
-                    ">
-                        WELCOME TO OUR<br>
-                        <span style="color: #ffd700; font-size: 24px; font-weight: bold;">SM VOLUNTEERS FORUM</span>
-                    </h2>
-
-                    <!-- Logo (Fixed Round Shape with Container) -->
-                    <div style="margin: 0 auto 25px auto; width: 160px; height: 160px; border-radius: 50%; border: 3px solid #b8860b; overflow: hidden; background-color: transparent;">
-                        <img src="cid:sm_logo" alt="SM Volunteers" style="display: block; width: 100%; height: 100%; object-fit: cover;">
-                    </div>
-
-                    <!-- Name Display (Transparent with Gold Border) -->
-                    <div style="
-                        background-color: transparent;
-                        border: 2px solid #ffd700;
-                        padding: 15px 0;
-                        margin: 30px auto;
-                        width: 80%;
-                        border-radius: 8px;
-                        box-shadow: 0 0 15px rgba(255, 215, 0, 0.1);
-                    ">
-                        <span style="
-                            font-family: 'Arial Black', 'Arial Bold', sans-serif;
-                            font-size: 30px;
-                            color: #ffd700; /* Gold Text */
-                            text-transform: uppercase;
-                            letter-spacing: 2px;
-                            display: block;
-                            font-weight: 900;
-                            text-shadow: 0 2px 4px rgba(0,0,0,0.5);
-                        ">
-                            {name.upper()}
-                        </span>
-                    </div>
-
-                    <!-- Main Body Content -->
-                    <div style="text-align: left; padding: 0 20px; color: #e0e0e0; font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; font-size: 16px; line-height: 1.6;">
-                        <p>
-                            We are delighted to inform you that you have <strong>successfully cleared the SM interview</strong>. 
-                            Your dedication, confidence, and commitment truly stood out.
-                        </p>
-                        <p>
-                            You are now an <strong>official member of the SM Team</strong> and eligible to participate in all 
-                            <strong>SM events, initiatives, and activities</strong>.
-                        </p>
-                        <p style="margin-top: 25px; font-size: 14px; color: #cccccc;">
-                            All upcoming information, announcements, and updates will be shared 
-                            <strong>only through the official WhatsApp group</strong>. 
-                            Kindly ensure that you join the group to stay informed.
-                        </p>
-                    </div>
-
-                    <!-- Footer Text -->
-                    <p style="
-                        font-family: 'Georgia', serif;
-                        font-size: 15px;
-                        color: #cccccc;
-                        line-height: 1.6;
-                        margin-top: 35px;
-                        font-style: italic;
-                        padding: 0 20px;
-                    ">
-                        Achievements are earned through dedication and hard work.<br>
-                        Congratulations on this proud milestone!
-                    </p>
-                    
-                    <!-- WhatsApp Button (Solid Green) -->
-                    <div style="margin-top: 40px; margin-bottom: 10px;">
-                        <a href="https://chat.whatsapp.com/CJeFwL5abHc8VkqeAa3n1v" style="
-                            background-color: #25D366; /* Solid Green */
-                            color: white;
-                            padding: 12px 30px;
-                            text-decoration: none;
-                            border-radius: 25px;
-                            font-family: sans-serif;
-                            font-weight: bold;
-                            box-shadow: 0 4px 10px rgba(37, 211, 102, 0.3);
-                            display: inline-block;
-                        ">
-                            Join WhatsApp Group
-                        </a>
-                    </div>
+    # Attach Inline Logos
+    # We assume load_logos_for_email returns 'sm_logo' key
+    if logos:
+         for cid, (encoded, subtype) in logos.items():
+            msg.attach(make_image_part(encoded, subtype, cid, cid=cid))
+    else:
+        print("⚠️ Warning: Logos not found. Email will be missing images.")
 
-                </div>
-                
-                <p style="color: #666666; font-size: 11px; margin-top: 20px; font-family: sans-serif;">
-                    KSRCT SM Volunteers
-                </p>
+    # Attach the personalized invitation image (cached across runs)
+    attachment_key = None
+    if invite_template:
+        attachment_key, path, encoded, subtype = get_invitation_asset(name, invite_template)
+        msg.attach(make_image_part(encoded, subtype, f"Invitation{os.path.splitext(path)[1]}"))
 
-            </td>
-        </tr>
-    </table>
-</body>
-</html>
-        """
-        
-        # Determine logos to attach
-        # We need 'sm_logo' for the HTML cid:sm_logo
-        
-        msg = MIMEMultipart('related')
-        msg['Subject'] = f"Congratulations {name}! - SM Volunteers"
-        msg['From'] = f"SM Official <{smtp_config['email']}>"
-        msg['To'] = email
+    return msg, attachment_key
 
-        html_part = MIMEText(html_content, 'html', 'utf-8')
-        msg.attach(html_part)
-        
-        # Attach Inline Logos
-        # We assume load_logos_for_email returns 'sm_logo' key
-        if logos:
-             for cid, (payload, subtype) in logos.items():
-                img = MIMEImage(payload, _subtype=subtype)
-                img.add_header('Content-Disposition', 'inline', filename=cid)
-                img.add_header('Content-ID', f'<{cid}>')
-                msg.attach(img)
-        else:
-            print("⚠️ Warning: Logos not found. Email will be missing images.")
 
-        print(f"✅ [{idx}/{total}] Prepared HTML email for {name}")
-        
-        # Send email
-        server.send_message(msg)
+def deliver_message(msg, smtp_config, pool=None):
+    """Send a built message, DKIM-signing it first when a signer is configured."""
+    signer = smtp_config.get('dkim')
+    if signer:
+        data = signer.sign_message(msg)
+
+        def send(server):
+            server.sendmail(smtp_config['email'], [msg['To']], data)
+    else:
+        def send(server):
+            server.send_message(msg)
+
+    if pool:
+        with pool.connection() as server:
+            send(server)
+    else:
+        server = connect_smtp(smtp_config)
+        send(server)
         server.quit()
+
+
+def send_single_email(recipient, smtp_config, logos, idx, total, invite_template=None, progress=None,
+                      pool=None, campaign=None, retries_left=0, stream=False):
+    """
+    Send a single email to one recipient (thread-safe).
+    With a ProgressView, outcomes are reported to it instead of printed.
+    With an SMTPPool, a pooled connection is reused instead of opening a new one.
+    The campaign variant the recipient received is recorded in the result.
+    Transient failures return status 'retry' while `retries_left` > 0.
+    With `stream`, the message is serialised straight to the socket
+    (stream_message.py) instead of being built as a MIME object tree.
+    """
+    email = recipient['email']
+    name = recipient['name'] 
+    variant = pick_variant(campaign or get_default_campaign(), email)
+    started = None
+    
+    try:
+        if stream:
+            started = time.monotonic()
+            attachment_key = deliver_streamed(recipient, smtp_config, logos, variant, invite_template, pool)
+            elapsed = time.monotonic() - started
+        else:
+            msg, attachment_key = build_invitation_message(recipient, smtp_config, logos, invite_template, variant)
+
+            if not progress:
+                print(f"✅ [{idx}/{total}] Prepared HTML email for {name}")
+            
+            # Send email
+            started = time.monotonic()
+            deliver_message(msg, smtp_config, pool)
+            elapsed = time.monotonic() - started
         
-        print(f"🚀 [{idx}/{total}] Sent to {email}")
-        return {'status': 'success', 'email': email}
+        if progress:
+            progress.emit('sent', email)
+        else:
+            print(f"🚀 [{idx}/{total}] Sent to {email}")
+        return {'status': 'success', 'email': email, 'variant': variant['name'], 'attachment': attachment_key,
+                'elapsed': elapsed}
         
     except Exception as e:
-        print(f"❌ [{idx}/{total}] Failed to send to {email}: {str(e)}")
-        return {'status': 'failed', 'email': email, 'error': str(e)}
+        elapsed = time.monotonic() - started if started else None
+        smtp_code, transient = classify_smtp_error(e)
+        status = 'retry' if transient and retries_left > 0 else 'failed'
+        if progress:
+            progress.emit(status, email, str(e))
+        else:
+            print(f"❌ [{idx}/{total}] Failed to send to {email}: {str(e)}")
+        return {'status': status, 'email': email, 'variant': variant['name'], 'error': str(e),
+                'smtp_code': smtp_code, 'transient': transient, 'elapsed': elapsed}
+
+
+def send_adaptively(recipients, send_one, controller, on_result, retry_backoff=RETRY_BACKOFF_SECONDS):
+    """
+    Send to `recipients` (any iterable, consumed lazily) at the concurrency
+    and rate the AIMD controller allows. send_one(idx, recipient, attempt)
+    returns a send_single_email() result; 'retry' results go to the back of
+    the queue, after every new recipient, and are not re-sent before their
+    backoff (`retry_backoff` seconds, doubling per attempt) has passed, so a
+    relay that asked us to slow down is not hit again straight away.
+    on_result(result, attempts) gets every final outcome. Recipients waiting
+    for a retry are held until the list is exhausted, so memory grows with
+    the number of transient failures only.
+    """
+    source = enumerate(recipients, 1)
+    retries = []  # heap of (due, sequence, idx, recipient, attempt)
+    sequence = count()
+    in_flight = {}
+
+    def next_job():
+        # Back of the queue: retries wait until every new recipient has been sent
+        item = next(source, None)
+        if item:
+            return item + (0,)
+        if retries and retries[0][0] <= time.monotonic():
+            return heapq.heappop(retries)[2:]
+        return None
+
+    def paced(idx, recipient, attempt):
+        controller.limiter.wait()
+        return send_one(idx, recipient, attempt)
+
+    with ThreadPoolExecutor(max_workers=controller.max_concurrency) as executor:
+        while True:
+            while len(in_flight) < controller.concurrency:
+                job = next_job()
+                if job is None:
+                    break
+                in_flight[executor.submit(paced, *job)] = job
+            # Wake up when the next retry is due, even if nothing completes
+            timeout = max(0.0, retries[0][0] - time.monotonic()) if retries else None
+            if not in_flight:
+                if timeout is None:
+                    break
+                time.sleep(timeout)
+                continue
+
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx, recipient, attempt = in_flight.pop(future)
+                result = future.result()
+                controller.record(result.get('elapsed'), result.get('transient', False),
+                                  result.get('smtp_code'))
+                if result['status'] == 'retry':
+                    due = time.monotonic() + retry_backoff * 2 ** attempt
+                    heapq.heappush(retries, (due, next(sequence), idx, recipient, attempt + 1))
+                else:
+                    on_result(result, attempt + 1)
 
 
-def send_invitation_emails(recipients, smtp_config, excel_file):
-    """Send invitation emails to all recipients with inline logo images (CID) using parallel processing."""
+def send_invitation_emails(recipients, smtp_config, excel_file, campaign=None, low_memory=False, total=None):
+    """
+    Send invitation emails to all recipients with inline logo images (CID) using parallel processing.
+
+    Every outcome, with its SMTP code and timing, is written to the run log
+    (run_log.py) as the run progresses.
+    `recipients` may be any iterable; it is consumed lazily. With
+    `low_memory`, messages are streamed to the socket, outcomes are kept only
+    in the run log, and (sent_count, failed_count) is returned instead of the
+    (successful, failed) lists, so memory use does not grow with the list.
+    """
+    started = time.monotonic()
+    total = len(recipients) if total is None else total
     
-    print(f"\n📨 Preparing to send {len(recipients)} invitation emails...")
+    print(f"\n📨 Preparing to send {total} invitation emails...")
     print("=" * 50)
     
     # Test connection first
     print(f"\n🔌 Testing connection to {smtp_config['server']}:{smtp_config['port']}...")
     try:
-        server = smtplib.SMTP(smtp_config['server'], smtp_config['port'], timeout=30)
-        server.starttls()
-        server.login(smtp_config['email'], smtp_config['password'])
+        server = connect_smtp(smtp_config, timeout=30)
         server.quit()
         print("✅ Connection successful!\n")
     except smtplib.SMTPAuthenticationError:
@@ -622,32 +877,100 @@ def send_invitation_emails(recipients, smtp_config, excel_file):
         print(f"🖼️  Logos loaded: {', '.join(logos.keys())}")
     else:
         print("⚠️  No logo files found; images will not display inline.")
+
+    invite_template = get_invite_template()
+    if invite_template:
+        print(f"🎨 Attaching personalized invitations from {invite_template}")
+
+    # Compile every template variant once, before the first send
+    campaign = campaign or get_default_campaign()
+    print(f"🧪 Campaign '{campaign['name']}': "
+          + ", ".join(f"{v['name']} (weight {v['weight']})" for v in campaign['variants']))
     
     successful = []
     failed = []
+    outcomes = Counter()
+    variants = Counter()
     
-    # Send emails sequentially with delay to avoid spam filters
-    print("📬 Sending emails sequentially (slow mode to avoid spam)...\n")
-    for idx, recipient in enumerate(recipients, 1):
-        result = send_single_email(recipient, smtp_config, logos, idx, len(recipients))
+    # Send with adaptive concurrency and rate: start as gently as the old
+    # fixed 2-second delay and let the controller find what the relay accepts
+    controller = AIMDController.from_env()
+    pool = SMTPPool(smtp_config, size=controller.max_concurrency)
+    run_log = open_run_log()
+    run_id = start_run(run_log, source=excel_file, campaign=campaign['name'],
+                       mode="low-memory" if low_memory else "standard", total=total)
+    recorder = RunRecorder(run_log, run_id)
+    first_message = None
+
+    def send_one(idx, recipient, attempt):
+        return send_single_email(recipient, smtp_config, logos, idx, total, invite_template, progress,
+                                 pool, campaign, retries_left=MAX_SEND_ATTEMPTS - 1 - attempt,
+                                 stream=low_memory)
+
+    def on_result(result, attempts):
+        nonlocal first_message
+        recorder.record(result, attempts=attempts)
+        outcomes[result['status']] += 1
+        variants[(result['variant'], result['status'])] += 1
+        if result['status'] == 'success' and first_message is None:
+            first_message = time.monotonic() - started
+        if low_memory:
+            return
         if result['status'] == 'success':
             successful.append(result['email'])
         else:
             failed.append({'email': result['email'], 'error': result.get('error', 'Unknown error')})
-        time.sleep(2)  # 2-second delay between emails
+
+    mode = "low-memory streaming" if low_memory else "adaptive rate control"
+    print(f"📬 Sending with {mode} (up to {controller.max_concurrency} connections, "
+          f"{controller.max_rate:g} msg/s)...\n")
+    try:
+        with ProgressView(total, limiter_state=controller.state) as progress:
+            send_adaptively(recipients, send_one, controller, on_result)
+    finally:
+        # Keep what was sent on record and log out of the relay even if the
+        # run is interrupted
+        recorder.close()
+        run_log.close()
+        pool.close()
+
+    metrics = controller.metrics()
+    # The run id keeps runs started in the same second from sharing a file
+    metrics_file = f"send_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}_run{run_id}.json"
+    with open(metrics_file, 'w', encoding='utf-8') as f:
+        json.dump(metrics, f, indent=2)
     
     print("\n" + "=" * 50)
     
     # Print summary
     print(f"\n📊 Summary:")
-    print(f"   ✅ Successfully sent: {len(successful)}")
-    print(f"   ❌ Failed: {len(failed)}")
+    print(f"   ✅ Successfully sent: {outcomes['success']}")
+    print(f"   ❌ Failed: {outcomes['failed']}")
+    if first_message is not None:
+        print(f"   ⏱️  First message accepted {first_message:.2f}s after the send started")
+    print(f"   🗂️  Run log: run #{run_id} in {DEFAULT_RUN_LOG} "
+          f"(python run_log.py failures / slowest / lookup EMAIL)")
+    print(f"   ⚙️  Rate control: {metrics['decision_counts']['increase']} increases, "
+          f"{metrics['decision_counts']['decrease']} decreases, final {controller.state()} "
+          f"(details in {metrics_file})")
+    if len(campaign['variants']) > 1:
+        for variant in campaign['variants']:
+            print(f"   🧪 {variant['name']}: {variants[(variant['name'], 'success')]} sent, "
+                  f"{variants[(variant['name'], 'failed')]} failed")
     
+    if low_memory:
+        return outcomes['success'], outcomes['failed']
     return successful, failed
 
 
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description="Send SM Volunteers invitation emails")
+    parser.add_argument("--campaign", help="Campaign definition with template variants (JSON)")
+    parser.add_argument("--low-memory", action="store_true",
+                        help="Stream recipients and messages; outcomes go only to the run log")
+    args = parser.parse_args()
+
     print("\n" + "=" * 60)
     print("  SM Volunteers - Official Selection Notifier")
     print("  K. S. Rangasamy College of Technology")
@@ -665,20 +988,34 @@ def main():
     
     # Read recipients
     print(f"\n📖 Reading recipients from {excel_file}...")
-    recipients = read_recipients_from_excel(excel_file)
+    if args.low_memory:
+        # Stream rows from the workbook instead of loading the whole list;
+        # counting is a streamed pass too, so the total matches what is sent
+        suppressed = load_suppression_set()
+        try:
+            total = count_recipients_in_excel(excel_file, suppressed)
+            preview = list(islice(iter_recipients_from_excel(excel_file, suppressed, low_memory=True), 5))
+        except Exception as e:
+            print(f"❌ Error reading Excel file: {str(e)}")
+            sys.exit(1)
+        recipients = iter_recipients_from_excel(excel_file, suppressed, low_memory=True)
+    else:
+        recipients = read_recipients_from_excel(excel_file)
+        total = len(recipients) if recipients else 0
+        preview = recipients
     
-    if not recipients:
+    if not preview:
         print("\n❌ No valid recipients found in the Excel file!")
         sys.exit(1)
     
-    print(f"✅ Found {len(recipients)} recipients")
+    print(f"✅ Found {total} recipients")
     
     # Show preview
     print("\n📋 Preview of recipients:")
-    for i, r in enumerate(recipients[:5], 1):
+    for i, r in enumerate(preview[:5], 1):
         print(f"   {i}. {r['name']} <{r['email']}>")
-    if len(recipients) > 5:
-        print(f"   ... and {len(recipients) - 5} more")
+    if total > 5:
+        print(f"   ... and {total - 5} more")
     
     # Confirm
     confirm = input("\n⚠️  Proceed with sending emails? (yes/no): ").strip().lower()
@@ -688,9 +1025,11 @@ def main():
     
     # Get SMTP config
     smtp_config = get_smtp_config()
+    campaign = load_campaign(args.campaign) if args.campaign else None
     
     # Send emails
-    successful, failed = send_invitation_emails(recipients, smtp_config, excel_file)
+    successful, failed = send_invitation_emails(recipients, smtp_config, excel_file, campaign,
+                                                low_memory=args.low_memory, total=total)
     
     if successful is not None:
         print("\n✅ Email sending process completed!")
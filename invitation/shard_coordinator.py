@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Multi-process campaign sharding.
+
+One Python process is limited by the GIL for image rendering, MIME building
+and TLS. The coordinator splits the recipient list into shards by hashing each
+email address and launches one worker process per shard, locally or on other
+machines over ssh. Every worker owns its own SMTP connection pool and streams
+its results back as JSON lines, which the coordinator merges into one journal.
+
+Every worker reads the whole workbook and hashes every address to find its
+own shard, so reading costs shards x the list, not the list once. That is a
+small share of a send (reading and hashing 100k rows takes seconds, sending
+them takes hours at relay rates) and keeps workers independent of the
+coordinator: remote shards need only the same Excel file, nothing is copied.
+
+Usage:
+    python shard_coordinator.py run recipients.xlsx --shards 4
+    python shard_coordinator.py run recipients.xlsx --shards 8 --hosts node1,node2 \
+        --remote-dir /srv/invitation --rate 10
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+SCRIPT_PATH = os.path.abspath(__file__)
+
+
+def shard_of(email, shards):
+    """Stable shard number for an email (same on every machine and run)."""
+    digest = hashlib.sha1(email.strip().lower().encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shards
+
+
+def run_shard(excel_file, shard, shards, connections=2, rate=0):
+    """
+    Worker entry point: send to every recipient in this shard.
+    Results go to stdout as JSON lines; all human-readable output to stderr.
+    """
+    # Keep the journal stream clean of the sender's console prints
+    journal = os.fdopen(os.dup(sys.stdout.fileno()), 'w', buffering=1, encoding='utf-8')
+    sys.stdout = sys.stderr
+
+    from progress import ProgressView
+    from send_invitations import (get_invite_template, get_smtp_config, load_logos_for_email,
+                                  read_recipients_from_excel, send_single_email)
+    from smtp_pool import RateLimiter, SMTPPool
+
+    recipients = read_recipients_from_excel(excel_file) or []
+    recipients = [r for r in recipients if shard_of(r['email'], shards) == shard]
+    host = socket.gethostname()
+    journal.write(json.dumps({'type': 'shard', 'shard': shard, 'host': host,
+                              'count': len(recipients)}) + "\n")
+
+    smtp_config = get_smtp_config()
+    logos = load_logos_for_email()
+    invite_template = get_invite_template()
+    pool = SMTPPool(smtp_config, size=connections)
+    limiter = RateLimiter(rate)
+    lock = threading.Lock()
+
+    def send(idx, recipient):
+        limiter.wait()
+        result = send_single_email(recipient, smtp_config, logos, idx, len(recipients),
+                                   invite_template, progress, pool)
+        result.update({'type': 'result', 'shard': shard, 'host': host,
+                       'timestamp': datetime.now().isoformat(timespec='seconds')})
+        with lock:
+            journal.write(json.dumps(result) + "\n")
+
+    with ProgressView(len(recipients), stream=sys.stderr) as progress:
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            for future in [executor.submit(send, idx, r) for idx, r in enumerate(recipients, 1)]:
+                future.result()
+    pool.close()
+    journal.close()
+
+
+def worker_command(args, shard, host):
+    """Command line that runs one shard, locally or on `host` over ssh."""
+    # Local workers run in the script's directory, so a relative path would
+    # point elsewhere; remote paths are relative to --remote-dir as given
+    excel_file = args.excel_file if host else os.path.abspath(args.excel_file)
+    worker_args = ['worker', excel_file, '--shard', str(shard), '--shards', str(args.shards),
+                   '--connections', str(args.connections), '--rate', str(args.rate / args.shards)]
+    if not host:
+        return [sys.executable, SCRIPT_PATH] + worker_args
+    remote = f"cd {shlex.quote(args.remote_dir)} && {args.remote_python} shard_coordinator.py " \
+             + " ".join(shlex.quote(a) for a in worker_args)
+    return ['ssh', host, remote]
+
+
+def run_coordinator(args):
+    """Launch one worker per shard and merge their results into one journal and the run log."""
+    from progress import ProgressView
+    from run_log import DEFAULT_RUN_LOG, RunRecorder, open_run_log, start_run
+
+    hosts = [h.strip() for h in args.hosts.split(",") if h.strip()] if args.hosts else []
+    counts = {'success': 0, 'failed': 0}
+    lock = threading.Lock()
+    progress = ProgressView(0, limiter_state=lambda: f"{args.shards} shards, {args.rate or '∞'} msg/s")
+    run_log = open_run_log()
+    run_id = start_run(run_log, source=args.excel_file, mode=f"{args.shards} shards")
+    recorder = RunRecorder(run_log, run_id)
+
+    # The run id keeps two runs started in the same second apart; the journal
+    # holds this run only, so `run_log.py import` never merges two runs
+    journal_path = (args.journal or
+                    f"shard_journal_{datetime.now().strftime('%Y%m%d_%H%M%S')}_run{run_id}.jsonl")
+    log_dir = os.path.splitext(journal_path)[0] + "_logs"
+    os.makedirs(log_dir, exist_ok=True)
+
+    def pump(proc, shard):
+        for line in proc.stdout:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('type') == 'shard':
+                with lock:
+                    progress.total += record['count']
+                continue
+            with lock:
+                journal.write(line if line.endswith("\n") else line + "\n")
+                recorder.record(record)
+                counts[record['status']] = counts.get(record['status'], 0) + 1
+            if record['status'] == 'success':
+                progress.emit('sent', record['email'])
+            else:
+                progress.emit('failed', record['email'], record.get('error'))
+
+    print(f"\n🧩 Splitting {args.excel_file} into {args.shards} shards "
+          f"({'hosts: ' + ', '.join(hosts) if hosts else 'local processes'})")
+    procs = []
+    try:
+        with open(journal_path, 'w', encoding='utf-8') as journal, progress:
+            for shard in range(args.shards):
+                host = hosts[shard % len(hosts)] if hosts else None
+                log = open(os.path.join(log_dir, f"shard_{shard}.log"), 'w', encoding='utf-8')
+                proc = subprocess.Popen(worker_command(args, shard, host), stdout=subprocess.PIPE,
+                                        stderr=log, text=True, cwd=os.path.dirname(SCRIPT_PATH))
+                thread = threading.Thread(target=pump, args=(proc, shard), daemon=True)
+                thread.start()
+                procs.append((shard, proc, thread, log))
+
+            exit_codes = {}
+            for shard, proc, thread, log in procs:
+                exit_codes[shard] = proc.wait()
+                thread.join()
+                log.close()
+    finally:
+        # Keep what the shards sent on record even if the run is interrupted;
+        # the lock keeps a pump thread from writing mid-flush
+        with lock:
+            recorder.close()
+        run_log.close()
+
+    print("\n" + "=" * 50)
+    print(f"\n📊 Summary:")
+    print(f"   ✅ Successfully sent: {counts['success']}")
+    print(f"   ❌ Failed: {counts['failed']}")
+    print(f"   📓 Journal: {journal_path}")
+    print(f"   🗂️  Run log: run #{run_id} in {DEFAULT_RUN_LOG}")
+    broken = [s for s, code in exit_codes.items() if code != 0]
+    if broken:
+        print(f"   ⚠️  Shards exited with errors: {broken} (see {log_dir})")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send a campaign from several processes or machines")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("run", "worker"):
+        p = sub.add_parser(name)
+        p.add_argument("excel_file")
+        p.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+        p.add_argument("--connections", type=int, default=2, help="SMTP connections per shard")
+        p.add_argument("--rate", type=float, default=0,
+                       help="Messages per second (run: total across shards; 0 = unlimited)")
+        if name == "run":
+            p.add_argument("--hosts", help="Comma-separated ssh hosts to run shards on")
+            p.add_argument("--remote-dir", default=".", help="Checkout directory on remote hosts")
+            p.add_argument("--remote-python", default="python3")
+            p.add_argument("--journal", help="Merged JSON-lines journal path")
+        else:
+            p.add_argument("--shard", type=int, required=True)
+
+    args = parser.parse_args()
+    if args.command == "worker":
+        run_shard(args.excel_file, args.shard, args.shards, args.connections, args.rate)
+    else:
+        sys.exit(run_coordinator(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Authenticated SMTP connection pool.
+
+Opening a connection costs a TCP handshake, STARTTLS and AUTH, which is often
+more than sending the message itself. A pool keeps up to `size` logged-in
+connections and hands them out to sending threads, replacing any connection
+that breaks or has been used for `max_messages` sends.
+"""
+
+import queue
+import smtplib
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_MAX_MESSAGES = 100  # Many relays cap messages per session
+
+
+def connect_smtp(smtp_config, timeout=90):
+    """Open a connection, upgrade to TLS and log in as configured."""
+    server = smtplib.SMTP(smtp_config['server'], smtp_config['port'], timeout=timeout)
+    if smtp_config.get('starttls', True):
+        server.starttls()
+    if smtp_config.get('password'):
+        server.login(smtp_config['email'], smtp_config['password'])
+    return server
+
+
+def classify_smtp_error(exc):
+    """
+    Return (smtp_code, transient) for a send failure. Transient failures
+    (4xx replies, dropped connections, timeouts) are worth retrying later and
+    signal that the relay wants us to slow down.
+    """
+    code = getattr(exc, 'smtp_code', None)
+    if isinstance(exc, smtplib.SMTPRecipientsRefused) and exc.recipients:
+        code = next(iter(exc.recipients.values()))[0]
+    if isinstance(code, int):
+        return code, 400 <= code < 500
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, socket.timeout, ConnectionError)):
+        return None, True
+    return None, False
+
+
+def close_quietly(server):
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+class SMTPPool:
+    """Thread-safe pool of authenticated SMTP connections."""
+
+    def __init__(self, smtp_config, size=1, max_messages=DEFAULT_MAX_MESSAGES, timeout=90):
+        self.smtp_config = smtp_config
+        self.size = size
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._uses = {}
+        self._closed = False
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection. If the body raises, the connection is discarded
+        instead of being returned, since its session state is unknown.
+        """
+        self._slots.acquire()
+        server = None
+        try:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                server = connect_smtp(self.smtp_config, self.timeout)
+            yield server
+        except Exception:
+            if server is not None:
+                self._discard(server)
+            raise
+        else:
+            self._release(server)
+        finally:
+            self._slots.release()
+
+    def _release(self, server):
+        with self._lock:
+            uses = self._uses.get(id(server), 0) + 1
+            self._uses[id(server)] = uses
+        if self._closed or uses >= self.max_messages:
+            self._discard(server)
+        else:
+            self._idle.put(server)
+
+    def _discard(self, server):
+        with self._lock:
+            self._uses.pop(id(server), None)
+        close_quietly(server)
+
+    def warm(self, count=None):
+        """Open connections ahead of time so the first sends skip the handshake."""
+        opened = []
+        for _ in range(min(count or self.size, self.size) - self._idle.qsize()):
+            opened.append(connect_smtp(self.smtp_config, self.timeout))
+        for server in opened:
+            self._idle.put(server)
+        return len(opened)
+
+    def idle_count(self):
+        return self._idle.qsize()
+
+    def keepalive(self):
+        """NOOP idle connections and drop the ones the server has closed."""
+        alive = []
+        while True:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                if server.noop()[0] == 250:
+                    alive.append(server)
+                    continue
+            except Exception:
+                pass
+            self._discard(server)
+        for server in alive:
+            self._idle.put(server)
+        return len(alive)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+class RateLimiter:
+    """
+    Spaces sends evenly at `rate` messages per second across all threads.
+    A rate of 0 means unlimited. The rate can be changed while running.
+    """
+
+    def __init__(self, rate=0):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def set_rate(self, rate):
+        with self._lock:
+            self.rate = rate
+
+    def wait(self):
+        """Block until the caller may send."""
+        with self._lock:
+            if not self.rate:
+                return
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1.0 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
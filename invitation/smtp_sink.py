@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Minimal local SMTP sink for benchmarks and dry runs.
+
+Accepts every message without TLS or login and throws it away, counting
+messages and bytes. Point the sender at it with:
+
+    python smtp_sink.py --port 2525
+    SMTP_SERVER=127.0.0.1 SMTP_PORT=2525 SMTP_PASSWORD= SMTP_STARTTLS=0 python send_invitations.py
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        sink = self.server.sink
+        write = self.wfile.write
+        write(b"220 smtp-sink ready\r\n")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"):
+                write(b"250-smtp-sink\r\n250-8BITMIME\r\n250 SIZE 52428800\r\n")
+            elif command == b"DATA":
+                write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                size = 0
+                for data_line in self.rfile:
+                    if data_line == b".\r\n":
+                        break
+                    size += len(data_line)
+                if sink.delay:
+                    time.sleep(sink.delay)
+                sink.record(size)
+                write(b"250 OK queued\r\n")
+            elif command == b"QUIT":
+                write(b"221 Bye\r\n")
+                return
+            else:
+                write(b"250 OK\r\n")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class SMTPSink:
+    """Threaded SMTP sink; port 0 picks a free port (see .port)."""
+
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0):
+        self.delay = delay
+        self.messages = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = None
+
+    def record(self, size):
+        with self._lock:
+            self.messages += 1
+            self.bytes += size
+
+    def smtp_config(self, sender="bench@example.com"):
+        """SMTP settings for send_invitations pointing at this sink."""
+        return {'server': self.host, 'port': self.port, 'email': sender, 'password': '',
+                'starttls': False, 'dkim': None}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accept and discard SMTP messages locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before accepting each message")
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port, args.delay)
+    print(f"📭 SMTP sink listening on {sink.host}:{sink.port} (Ctrl+C to stop)")
+    try:
+        sink._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink._server.server_close()
+        print(f"\n📊 Received {sink.messages} messages, {sink.bytes / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Invitation messages serialised straight to the SMTP socket.
+
+build_invitation_message() builds a MIMEMultipart tree per recipient, and
+sending it serialises that tree into one more full copy of the message. For
+low-memory runs this module writes the same MIME structure
+
+    multipart/related
+      multipart/alternative (text/plain, text/html)
+      inline logos
+      invitation attachment (optional)
+
+as a list of byte chunks instead. The logo parts are serialised once per
+process and shared by every message, so per message only the headers, the
+two rendered bodies and the attachment payload are new bytes. The chunks are
+written to the socket one after another after a manual MAIL/RCPT/DATA
+exchange.
+
+Every body line is either base64 or a MIME boundary, so no line can start
+with "." and the DATA stream needs no dot-stuffing pass.
+"""
+
+import base64
+import os
+import smtplib
+import socket
+import threading
+import uuid
+from email.header import Header
+from email.utils import formatdate, make_msgid
+
+from campaign import render_variant
+from dkim_signing import canonicalize_body_lines
+
+CRLF = b'\r\n'
+WRITE_BATCH = 64 * 1024
+
+_static_parts = {}  # (filename, cid) -> (payload object, serialized bytes, canonical bytes)
+_static_lock = threading.Lock()
+
+
+def _base64_lines(data):
+    """RFC 2045 base64 body (76-char CRLF lines)."""
+    return base64.encodebytes(data).replace(b'\n', CRLF)
+
+
+def _payload_lines(encoded):
+    """Pre-encoded base64 text (LF or CRLF lines) as CRLF bytes."""
+    data = encoded.encode('ascii') if isinstance(encoded, str) else encoded
+    data = data.replace(CRLF, b'\n').replace(b'\n', CRLF)
+    return data if data.endswith(CRLF) else data + CRLF
+
+
+def _header(name, value):
+    """One header line; non-ASCII values are RFC 2047 encoded."""
+    try:
+        value.encode('ascii')
+    except UnicodeEncodeError:
+        value = Header(value, 'utf-8').encode(linesep="\r\n")
+    return f"{name}: {value}\r\n".encode('ascii')
+
+
+def _text_part(text, subtype):
+    headers = (f'Content-Type: text/{subtype}; charset="utf-8"\r\nMIME-Version: 1.0\r\n'
+               f'Content-Transfer-Encoding: base64\r\n\r\n')
+    return headers.encode('ascii') + _base64_lines(text.encode('utf-8'))
+
+
+def _image_part(encoded, subtype, filename, cid=None):
+    disposition = 'inline' if cid else 'attachment'
+    headers = (f'Content-Type: image/{subtype}\r\nMIME-Version: 1.0\r\n'
+               f'Content-Transfer-Encoding: base64\r\n'
+               f'Content-Disposition: {disposition}; filename="{filename}"\r\n')
+    if cid:
+        headers += f'Content-ID: <{cid}>\r\n'
+    return headers.encode('ascii') + CRLF + _payload_lines(encoded)
+
+
+def static_image_part(encoded, subtype, filename, cid):
+    """(serialized, canonical) bytes of a shared inline image, built once per payload."""
+    key = (filename, cid)
+    cached = _static_parts.get(key)
+    if cached is None or cached[0] is not encoded:
+        raw = _image_part(encoded, subtype, filename, cid)
+        cached = (encoded, raw, canonicalize_body_lines(raw))
+        with _static_lock:
+            _static_parts[key] = cached
+    return cached[1], cached[2]
+
+
+def build_message_chunks(recipient, sender, logos, variant, attachment=None):
+    """
+    Serialise one invitation. Returns (headers, body_chunks, static_segments):
+    body_chunks concatenated is the message body, and static_segments lists
+    the (serialized, canonical) shared parts for DKIM's body cache.
+    `attachment` is (base64_payload, subtype, filename) or None.
+    """
+    subject, text_content, html_content = render_variant(variant, recipient)
+    related = f"=============={uuid.uuid4().hex}=="
+    alternative = f"=============={uuid.uuid4().hex}=="
+    open_related = f"--{related}\r\n".encode()
+    open_alternative = f"--{alternative}\r\n".encode()
+
+    headers = b''.join([
+        f'Content-Type: multipart/related; boundary="{related}"\r\nMIME-Version: 1.0\r\n'.encode(),
+        _header('Subject', subject),
+        _header('From', f"SM Official <{sender}>"),
+        _header('To', recipient['email']),
+        _header('Date', formatdate(localtime=True)),
+        _header('Message-ID', make_msgid(domain=sender.rpartition('@')[2] or None)),
+    ])
+
+    chunks = [open_related,
+              f'Content-Type: multipart/alternative; boundary="{alternative}"\r\n'
+              f'MIME-Version: 1.0\r\n\r\n'.encode(),
+              open_alternative, _text_part(text_content, 'plain'),
+              open_alternative, _text_part(html_content, 'html'),
+              f"--{alternative}--\r\n".encode()]
+    static_segments = []
+    for cid, (encoded, subtype) in (logos or {}).items():
+        raw, canonical = static_image_part(encoded, subtype, cid, cid)
+        chunks += [open_related, raw]
+        static_segments.append((raw, canonical))
+    if attachment:
+        encoded, subtype, filename = attachment
+        chunks += [open_related, _image_part(encoded, subtype, filename)]
+    chunks.append(f"--{related}--\r\n".encode())
+    return headers, chunks, static_segments
+
+
+def send_chunks(server, sender, to, chunks):
+    """Send an already serialised message chunk by chunk on an open connection."""
+    server.ehlo_or_helo_if_needed()
+    if server.sock is not None:
+        # The DATA terminator is a tiny write right after a large one; without
+        # this, Nagle's algorithm holds it until the previous segment is ACKed
+        server.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    code, resp = server.mail(sender)
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPSenderRefused(code, resp, sender)
+    code, resp = server.rcpt(to)
+    if code not in (250, 251):
+        server.rset()
+        raise smtplib.SMTPRecipientsRefused({to: (code, resp)})
+    server.putcmd("data")
+    code, resp = server.getreply()
+    if code != 354:
+        server.rset()
+        raise smtplib.SMTPDataError(code, resp)
+    # Small pieces (headers, boundaries) are batched so the socket sees a few
+    # large writes; shared logo parts are written as they are, without copying
+    pending = []
+    pending_size = 0
+    for chunk in chunks:
+        if len(chunk) >= WRITE_BATCH:
+            if pending:
+                server.send(b''.join(pending))
+                pending, pending_size = [], 0
+            server.send(chunk)
+            continue
+        pending.append(chunk)
+        pending_size += len(chunk)
+        if pending_size >= WRITE_BATCH:
+            server.send(b''.join(pending))
+            pending, pending_size = [], 0
+    pending.append(b".\r\n")
+    server.send(b''.join(pending))
+    code, resp = server.getreply()
+    if code != 250:
+        raise smtplib.SMTPDataError(code, resp)
+
+
+def deliver_streamed(recipient, smtp_config, logos, variant, invite_template=None, pool=None):
+    """
+    Stream one invitation to its recipient. Returns the attachment cache key,
+    if an invitation image was attached.
+    """
+    from send_invitations import get_invitation_asset
+    from smtp_pool import connect_smtp
+
+    attachment, attachment_key = None, None
+    if invite_template:
+        attachment_key, path, encoded, subtype = get_invitation_asset(recipient['name'], invite_template)
+        attachment = (encoded, subtype, f"Invitation{os.path.splitext(path)[1]}")
+
+    sender = smtp_config['email']
+    headers, body, static_segments = build_message_chunks(recipient, sender, logos, variant, attachment)
+    chunks = [headers, CRLF] + body
+    signer = smtp_config.get('dkim')
+    if signer:
+        # Signing needs the whole message once; shared parts still hash from cache
+        chunks = [signer.sign(b''.join(chunks), static_segments)]
+
+    if pool:
+        with pool.connection() as server:
+            send_chunks(server, sender, recipient['email'], chunks)
+    else:
+        server = connect_smtp(smtp_config)
+        send_chunks(server, sender, recipient['email'], chunks)
+        server.quit()
+    return attachment_key
@@ -0,0 +1,66 @@
+"""
+DKIM regression tests: signatures made by DKIMSigner must verify with dkimpy,
+including for recipients whose names (and so Subjects) are not ASCII.
+
+Run with: python -m pytest test_dkim_signing.py (needs cryptography and dkimpy)
+"""
+
+import base64
+
+import pytest
+
+pytest.importorskip("cryptography")
+dkim = pytest.importorskip("dkim")
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from campaign import load_campaign, pick_variant
+from dkim_signing import DKIMSigner
+from send_invitations import build_invitation_message, load_logos_for_email
+from stream_message import CRLF, build_message_chunks
+
+DOMAIN = "example.com"
+SELECTOR = "test"
+SENDER = f"sender@{DOMAIN}"
+NAMES = ["Plain Name", "Bób Ünïcode", "Zoë 李雷"]
+
+
+@pytest.fixture(scope="module")
+def signer_and_dns(tmp_path_factory):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    key_path = tmp_path_factory.mktemp("dkim") / "key.pem"
+    key_path.write_bytes(key.private_bytes(serialization.Encoding.PEM,
+                                           serialization.PrivateFormat.PKCS8,
+                                           serialization.NoEncryption()))
+    public = key.public_key().public_bytes(serialization.Encoding.DER,
+                                           serialization.PublicFormat.SubjectPublicKeyInfo)
+    record = b"v=DKIM1; k=rsa; p=" + base64.b64encode(public)
+
+    def dnsfunc(name, timeout=5):
+        return record if name == f"{SELECTOR}._domainkey.{DOMAIN}.".encode() else None
+
+    return DKIMSigner(DOMAIN, SELECTOR, str(key_path)), dnsfunc
+
+
+@pytest.mark.parametrize("name", NAMES)
+def test_signed_mime_message_verifies(signer_and_dns, name):
+    signer, dnsfunc = signer_and_dns
+    recipient = {'email': "someone@example.org", 'name': name}
+    msg, _ = build_invitation_message(recipient, {'email': SENDER}, load_logos_for_email())
+
+    data = signer.sign_message(msg)
+
+    assert dkim.verify(data, dnsfunc=dnsfunc)
+
+
+@pytest.mark.parametrize("name", NAMES)
+def test_signed_streamed_message_verifies(signer_and_dns, name):
+    signer, dnsfunc = signer_and_dns
+    recipient = {'email': "someone@example.org", 'name': name}
+    variant = pick_variant(load_campaign(), recipient['email'])
+    headers, body, static_segments = build_message_chunks(recipient, SENDER, load_logos_for_email(), variant)
+
+    data = signer.sign(b''.join([headers, CRLF] + body), static_segments)
+
+    assert dkim.verify(data, dnsfunc=dnsfunc)
@@ -0,0 +1,91 @@
+"""
+Access checks on the send daemon: only the operator may make it send mail.
+The daemon itself is replaced by a stub, so no SMTP server is needed.
+
+Run with: python -m pytest test_send_daemon.py
+"""
+
+import json
+import os
+import socket
+import stat
+import threading
+
+import pytest
+
+from send_client import UnixHTTPConnection, connect, read_token, request
+from send_daemon import make_server
+
+PAYLOAD = {'recipients': [{'email': "someone@example.org", 'name': "Someone"}]}
+
+
+class StubDaemon:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, recipients, source):
+        self.sent.append(recipients)
+        return {'run_id': 1, 'sent': len(recipients), 'failed': 0, 'suppressed': 0, 'failures': [],
+                'time_to_first_message': 0.0, 'elapsed': 0.0}
+
+    def status(self):
+        return {'requests': len(self.sent)}
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(**kwargs):
+        server, _, cleanup_path = make_server(**kwargs)
+        server.send_daemon = StubDaemon()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append((server, cleanup_path))
+        return server
+
+    yield start
+    for server, cleanup_path in servers:
+        server.shutdown()
+        server.server_close()
+        if os.path.exists(cleanup_path):
+            os.unlink(cleanup_path)
+
+
+def raw_post(conn, body, headers):
+    conn.request('POST', '/send', body=json.dumps(body).encode('utf-8'), headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="needs Unix sockets")
+def test_unix_socket_is_owner_only(serve, tmp_path):
+    path = str(tmp_path / "daemon.sock")
+    server = serve(socket_path=path)
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert request(UnixHTTPConnection(path), '/send', PAYLOAD)['sent'] == 1
+    assert raw_post(UnixHTTPConnection(path), PAYLOAD, {'Content-Type': 'text/plain'}) == 415
+    assert len(server.send_daemon.sent) == 1
+
+
+def test_tcp_listener_requires_token_host_and_json(serve, tmp_path):
+    token_file = str(tmp_path / "daemon.token")
+    server = serve(port=0, token_file=token_file)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    token = read_token(token_file)
+
+    assert stat.S_IMODE(os.stat(token_file).st_mode) == 0o600
+    assert raw_post(connect(url=url), PAYLOAD, {'Content-Type': 'application/json'}) == 401
+    assert raw_post(connect(url=url), PAYLOAD, {'Content-Type': 'application/json',
+                                                'Authorization': "Bearer wrong"}) == 401
+    # A simple cross-origin request from a web page
+    assert raw_post(connect(url=url), PAYLOAD, {'Content-Type': 'text/plain',
+                                                'Authorization': f"Bearer {token}"}) == 415
+    # DNS rebinding: the browser sends the attacker's host name
+    assert raw_post(connect(url=url), PAYLOAD, {'Content-Type': 'application/json', 'Host': "evil.example",
+                                                'Authorization': f"Bearer {token}"}) == 403
+    assert server.send_daemon.sent == []
+
+    assert request(connect(url=url), '/send', PAYLOAD, token)['sent'] == 1
+    assert request(connect(url=url), '/status', token=token) == {'requests': 1}
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Constant-memory row reader for .xlsx workbooks.
+
+openpyxl's read-only mode parses rows lazily, but each parsed <row> element
+stays attached to the sheet's XML tree, so memory still grows by ~100 bytes
+per row (about 100 MB for a million recipients). This reader walks the
+active worksheet with iterparse and detaches every row once it has been
+read. Workbooks saved by Excel keep every cell's text in the shared strings
+table, which is as large as the list itself; it is spilled to temporary
+files and read back per cell, so memory stays flat either way.
+
+Only what the recipient reader needs is supported: cell text, numbers and
+booleans as plain values, no styles, dates or formulas.
+"""
+
+import posixpath
+import re
+import struct
+import sys
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+
+_COLUMN = re.compile(r'[A-Z]+')
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _column_index(ref):
+    """'C12' -> 2"""
+    index = 0
+    for char in _COLUMN.match(ref).group(0):
+        index = index * 26 + ord(char) - 64
+    return index - 1
+
+
+def _text(element):
+    """Concatenated <t> text of a shared or inline string (rich text runs included)."""
+    return ''.join(t.text or '' for t in element.iter() if _local(t.tag) == 't')
+
+
+def _active_sheet_path(archive):
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    active, sheet_ids = None, []
+    for element in workbook.iter():
+        name = _local(element.tag)
+        if name == 'workbookView' and active is None:
+            active = int(element.get('activeTab', 0))
+        elif name == 'sheet':
+            sheet_ids.append(next(v for k, v in element.attrib.items() if _local(k) == 'id'))
+    rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    targets = {rel.get('Id'): rel.get('Target') for rel in rels}
+    target = targets[sheet_ids[min(active or 0, len(sheet_ids) - 1)]]
+    return target.lstrip('/') if target.startswith('/') else posixpath.normpath('xl/' + target)
+
+
+class _SharedStrings:
+    """
+    Read-only shared strings table backed by two anonymous temporary files:
+    the UTF-8 text of every string, and a fixed-width (offset, length) index
+    into it, so a lookup is two seeks and the table costs no memory.
+    """
+
+    _ENTRY = struct.Struct('<QI')
+
+    def __init__(self, archive):
+        self._text = tempfile.TemporaryFile()
+        self._index = tempfile.TemporaryFile()
+        self.count = 0
+        if 'xl/sharedStrings.xml' in archive.namelist():
+            self._load(archive)
+
+    def _load(self, archive):
+        offset = 0
+        with archive.open('xl/sharedStrings.xml') as source:
+            table = None
+            for event, element in ET.iterparse(source, events=('start', 'end')):
+                if event == 'start':
+                    if table is None:
+                        table = element
+                    continue
+                if _local(element.tag) != 'si':
+                    continue
+                data = _text(element).encode('utf-8')
+                self._text.write(data)
+                self._index.write(self._ENTRY.pack(offset, len(data)))
+                offset += len(data)
+                self.count += 1
+                # Detach the finished string so the tree never grows
+                table.remove(element)
+        self._text.flush()
+        self._index.flush()
+
+    def __getitem__(self, position):
+        if not 0 <= position < self.count:
+            raise IndexError(f"shared string {position} out of range")
+        self._index.seek(position * self._ENTRY.size)
+        offset, length = self._ENTRY.unpack(self._index.read(self._ENTRY.size))
+        self._text.seek(offset)
+        return self._text.read(length).decode('utf-8')
+
+    def close(self):
+        self._text.close()
+        self._index.close()
+
+
+def _cell_value(cell, cell_type, shared):
+    if cell_type == 'inlineStr':
+        return _text(cell)
+    value = next((child.text for child in cell if _local(child.tag) == 'v'), None)
+    if value is None:
+        return None
+    if cell_type == 's':
+        return shared[int(value)]
+    if cell_type == 'b':
+        return value == '1'
+    if cell_type in ('str', 'e'):
+        return value
+    number = float(value)
+    return int(number) if number.is_integer() and 'E' not in value.upper() else number
+
+
+def iter_xlsx_rows(file_path):
+    """Yield each row of the active worksheet as a tuple of values (None for empty cells)."""
+    with zipfile.ZipFile(file_path) as archive:
+        shared = _SharedStrings(archive)
+        try:
+            yield from _iter_sheet_rows(archive, shared)
+        finally:
+            shared.close()
+
+
+def _iter_sheet_rows(archive, shared):
+    with archive.open(_active_sheet_path(archive)) as source:
+        sheet_data = None
+        expected_row = 1
+        for event, element in ET.iterparse(source, events=('start', 'end')):
+            name = _local(element.tag)
+            if event == 'start':
+                if name == 'sheetData':
+                    sheet_data = element
+                continue
+            if name != 'row':
+                continue
+
+            # Keep row numbering like openpyxl: skipped rows come back empty
+            number = int(element.get('r', expected_row))
+            for _ in range(expected_row, number):
+                yield ()
+            expected_row = number + 1
+
+            values = []
+            for position, cell in enumerate(c for c in element if _local(c.tag) == 'c'):
+                ref = cell.get('r')
+                column = _column_index(ref) if ref else position
+                values.extend([None] * (column - len(values)))
+                values.append(_cell_value(cell, cell.get('t'), shared))
+            yield tuple(values)
+
+            # Detach the finished row so the tree never grows
+            if sheet_data is not None:
+                sheet_data.remove(element)
+            element.clear()
+
+
+def count_xlsx_rows(file_path):
+    """
+    Rows in the active worksheet, from its <dimension> element when present
+    (Excel always writes one); otherwise the rows are streamed and counted.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        with archive.open(_active_sheet_path(archive)) as source:
+            for _, element in ET.iterparse(source, events=('start',)):
+                name = _local(element.tag)
+                if name == 'dimension':
+                    last = element.get('ref', '').split(':')[-1]
+                    digits = last.lstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+                    if digits.isdigit() and ':' in element.get('ref', ''):
+                        return int(digits)
+                elif name == 'sheetData':
+                    break
+    return sum(1 for _ in iter_xlsx_rows(file_path))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python xlsx_stream.py workbook.xlsx")
+        sys.exit(1)
+    print(f"📄 {count_xlsx_rows(sys.argv[1])} rows in the active sheet of {sys.argv[1]}")